@@ -1,166 +1,329 @@
+import json
+import string
+
 import streamlit as st
-import pandas as pd
-import re
-import matplotlib.pyplot as plt
-from functools import reduce
+from proteomics_explore import charts, ingest, instrument
+from proteomics_explore.analysis import count_semi_tryptic, match_peptides
+from proteomics_explore.batch import summarize_proteome
+from proteomics_explore.bundle import open_bundle
+from proteomics_explore.cache import shared_results
+from proteomics_explore.classify import DEFAULT_PROTEASE, PROTEASES, classify_sites
+from proteomics_explore.coverage import OVERVIEW_BINS, Coverage
+from proteomics_explore.index import load_index
+from proteomics_explore.overlap import OverlapCounts
+from proteomics_explore.pipeline import Pipeline
+from proteomics_explore.render import (TOOL_STYLES, WINDOW_SIZE, WINDOW_THRESHOLD, render_sequence_html,
+                                       stylesheet, tool_slots)
+from proteomics_explore.stream import load_index_streaming
+
+
+def show_bar_chart(mode, key, labels, values, colors, xlabel, title, xmax=None, fmt="{:.2f}"):
+    if mode == "native":
+        st.bar_chart(charts.bar_data(labels, values, colors), x="label", y="value", color="color",
+                     horizontal=True, sort=False, x_label=xlabel, y_label="", height=180)
+    elif mode == "svg":
+        svg = charts.cached_render(("svg",) + key, lambda: charts.bar_chart_svg(labels, values, colors, xlabel,
+                                                                              title, xmax, fmt))
+        st.markdown(svg, unsafe_allow_html=True)
+    else:
+        st.image(charts.cached_render(("png",) + key, lambda: charts.bar_chart_png(labels, values, colors, xlabel,
+                                                                                   title, xmax, fmt)))
+
+
+def show_track(mode, key, positions, depths, colors, length, window):
+    if mode == "native":
+        st.area_chart(charts.track_data(depths, colors, positions), color=[colors[tool] for tool in depths],
+                      x_label="Residue", y_label="Depth", height=200)
+    elif mode == "svg":
+        fractions = (window[0] / max(length, 1), window[1] / max(length, 1))
+        st.markdown(charts.cached_render(("svg",) + key, lambda: charts.track_svg(depths, colors, window=fractions)),
+                    unsafe_allow_html=True)
+    else:
+        st.image(charts.cached_render(("png",) + key, lambda: charts.track_png(depths, colors, positions, length,
+                                                                               window)))
+
 
 # Streamlit app title
 st.title("Protein Sequence Visualization with Simplified-Semi-Tryptic Classification")
 
-# File uploaders
-main_file = st.file_uploader("Upload Main Data CSV", type=["csv"])
-tool_a_file = st.file_uploader("Upload TOOL-A CSV", type=["csv"])
-tool_b_file = st.file_uploader("Upload TOOL-B CSV", type=["csv"])
-
-if main_file and tool_a_file and tool_b_file:
-    # Read CSV files
-    main_df = pd.read_csv(main_file)
-    tool_a_df = pd.read_csv(tool_a_file)
-    tool_b_df = pd.read_csv(tool_b_file)
-
-    # Display data samples
-    st.subheader("Main Data Sample")
-    st.dataframe(main_df.head())
-
-    col1, col2 = st.columns(2)
-    with col1:
-        st.subheader("TOOL-A Sample")
-        st.dataframe(tool_a_df.head())
-    with col2:
-        st.subheader("TOOL-B Sample")
-        st.dataframe(tool_b_df.head())
-
-    # Merge data on ProteinName
-    merged_df = reduce(lambda left, right: pd.merge(left, right, on="ProteinName", how="left"), 
-                       [main_df, tool_a_df, tool_b_df])
-    
-    # Dropdown for protein selection
-    selected_protein = st.selectbox("Select a Protein Name", merged_df["ProteinName"].dropna().unique())
-
-    if selected_protein:
-        # Extract sequence and peptides
-        sequence = merged_df.loc[merged_df["ProteinName"] == selected_protein, "Sequence"].values[0]
-        peptides_a = merged_df.loc[merged_df["ProteinName"] == selected_protein, "Peptides_A"].dropna().unique()
-        peptides_b = merged_df.loc[merged_df["ProteinName"] == selected_protein, "Peptides_B"].dropna().unique()
-
-        # Classification function
-        def classify_simplified_semi_tryptic(protein_sequence, peptide):
-            if pd.isna(protein_sequence) or pd.isna(peptide):
-                return "no_simplified_semi_tryptic"
-            
-            index = protein_sequence.find(peptide)
-            if index == -1:
-                return "no_simplified_semi_tryptic"
-
-            if peptide[-1] in ['K', 'R']:
-                if index == 0 or protein_sequence[index - 1] not in ['K', 'R']:
-                    return "simplified_semi_tryptic"
-            
-            if peptide[-1] not in ['K', 'R']:
-                if index > 0 and protein_sequence[index - 1] in ['K', 'R']:
-                    return "simplified_semi_tryptic"
-
-            return "no_simplified_semi_tryptic"
-
-        # Classify peptides
-        simplified_semi_tryptic_counts = {"TOOL-A": 0, "TOOL-B": 0}
-        
-        def classify_and_count(peptides, tool):
-            count = 0
-            for pep in peptides:
-                if classify_simplified_semi_tryptic(sequence, pep) == "simplified_semi_tryptic":
-                    count += 1
-            simplified_semi_tryptic_counts[tool] = count
-
-        classify_and_count(peptides_a, "TOOL-A")
-        classify_and_count(peptides_b, "TOOL-B")
-
-        # Toggle buttons for highlighting
-        if "highlight_a" not in st.session_state:
-            st.session_state["highlight_a"] = False
-        if "highlight_b" not in st.session_state:
-            st.session_state["highlight_b"] = False
-
-        if st.button("Highlight Peptides_A"):
-            st.session_state["highlight_a"] = not st.session_state["highlight_a"]
-        if st.button("Highlight Peptides_B"):
-            st.session_state["highlight_b"] = not st.session_state["highlight_b"]
-
-        # Highlighting function
-        def highlight_sequence(seq, peptides_a, peptides_b):
-            for pep in peptides_a:
-                if isinstance(pep, str):
-                    seq = re.sub(f"({pep})", f"<span style='background-color:red;'>{pep}</span>", seq)
-            for pep in peptides_b:
-                if isinstance(pep, str):
-                    seq = re.sub(f"({pep})", f"<span style='color:blue; font-weight:bold;'>{pep}</span>", seq)
-            return seq
-
-        # Apply highlighting
-        highlighted_seq = sequence
-        if st.session_state["highlight_a"] or st.session_state["highlight_b"]:
-            highlighted_seq = highlight_sequence(sequence, peptides_a if st.session_state["highlight_a"] else [], 
-                                                 peptides_b if st.session_state["highlight_b"] else [])
-
-        # Highlight K and R responsible for classification in red
-        highlighted_seq = re.sub(r'([KR])', r"<span style='color:green; font-weight:bold;'>\1</span>", highlighted_seq)
-
-        # Coverage calculation
-        def calculate_coverage(seq, peptides):
-            covered_positions = set()
-            for pep in peptides:
-                if isinstance(pep, str):
-                    start_idx = 0
-                    while (start_idx := seq.find(pep, start_idx)) != -1:
-                        covered_positions.update(range(start_idx, start_idx + len(pep)))
-                        start_idx += 1  
-            return (len(covered_positions) / len(seq)) * 100 if len(seq) > 0 else 0
-
-        coverage_a = calculate_coverage(sequence, peptides_a) if st.session_state["highlight_a"] else 0
-        coverage_b = calculate_coverage(sequence, peptides_b) if st.session_state["highlight_b"] else 0
-        total_coverage = calculate_coverage(sequence, list(peptides_a) + list(peptides_b))
-
-        # Display highlighted sequence
-        st.subheader("Highlighted Protein Sequence")
-        st.markdown(f"""<div style='font-family:monospace; font-size:18px; white-space:pre-wrap; word-wrap:break-word;'>{highlighted_seq}</div>""", unsafe_allow_html=True)
-
-        # Display coverage
-        st.subheader("Coverage")
-        st.write(f"Coverage TOOL-A: {coverage_a:.2f}%")
-        st.write(f"Coverage TOOL-B: {coverage_b:.2f}%")
-        st.write(f"Total Coverage: {total_coverage:.2f}%")
-
-        # Coverage visualization
-        fig, ax = plt.subplots(figsize=(18, 2))
-        bars = ax.barh(["TOOL-A", "TOOL-B", "Total"], [coverage_a, coverage_b, total_coverage], color=["red", "blue", "green"])
-        for bar in bars:
-            width = bar.get_width()
-            ax.text(width + 1, bar.get_y() + bar.get_height()/2, f'{width:.2f}%', va='center')
-        ax.set_xlabel("Coverage (%)")
-        ax.set_title("Coverage Comparison")
-        ax.set_xlim(0, 100)
-        st.pyplot(fig)
-
-        # Display Simplified-Semi-Tryptic Count
-        st.subheader("Simplified-Semi-Tryptic Count")
-        st.write(f"Simplified-Semi-Tryptic Peptide Count TOOL-A: {simplified_semi_tryptic_counts["TOOL-A"]:.0f}")
-        st.write(f"Simplified-Semi-Tryptic Peptide Count TOOL-B: {simplified_semi_tryptic_counts["TOOL-B"]:.0f}")
-        st.write(f"Total Simplified-Semi-Tryptic Peptide Count: {simplified_semi_tryptic_counts["TOOL-A"]+simplified_semi_tryptic_counts["TOOL-B"]:.0f}")
-        
-        # # Simplified-Semi-Tryptic Histogram
-        # st.subheader("Simplified-Semi-Tryptic Peptide Count")
-        # fig, ax = plt.subplots()
-        # ax.bar(["TOOL-A", "TOOL-B"], [simplified_semi_tryptic_counts["TOOL-A"], simplified_semi_tryptic_counts["TOOL-B"]], color=["red", "blue"])
-        # ax.set_ylabel("Count")
-        # ax.set_title("Simplified-Semi-Tryptic Peptide Count by Tool")
-        # st.pyplot(fig)
-
-        # Coverage visualization
-        fig, ax = plt.subplots(figsize=(18, 2))
-        bars = ax.barh(["TOOL-A", "TOOL-B", "Total"], [simplified_semi_tryptic_counts["TOOL-A"], simplified_semi_tryptic_counts["TOOL-B"], simplified_semi_tryptic_counts["TOOL-A"]+simplified_semi_tryptic_counts["TOOL-B"]], color=["red", "blue", "green"])
-        for bar in bars:
-            width = bar.get_width()
-            ax.text(width + 1, bar.get_y() + bar.get_height()/2, f'{width:.0f}', va='center')
-        ax.set_xlabel("Count")
-        ax.set_title("Simplified-Semi-Tryptic Peptide Count")
-        st.pyplot(fig)
+# A dataset compiled with `python -m proteomics_explore compile` opens without uploading its CSVs
+bundle_path = st.text_input("Compiled Dataset Bundle (directory, optional)").strip()
+
+# File uploaders: one per search tool, named TOOL-A, TOOL-B, ... in upload order
+main_file, tool_files = None, {}
+if not bundle_path:
+    main_file = st.file_uploader("Upload Main Data CSV", type=["csv"])
+    n_tools = st.number_input("Number of Tools", 1, len(charts.TOOL_COLORS), 2)
+    tool_files = {f"TOOL-{letter}": st.file_uploader(f"Upload TOOL-{letter} CSV", type=["csv"])
+                  for letter in string.ascii_uppercase[:n_tools]}
+
+if bundle_path or (main_file and all(tool_files.values())):
+    # Large peptide files can be streamed in chunks (spilling to disk) instead of parsed whole
+    stream_peptides = st.sidebar.checkbox("Stream peptide files in chunks (large uploads)")
+
+    # Cleavage rule used for the semi-tryptic classification and the cleavage-site highlighting
+    protease = st.sidebar.selectbox("Protease Rule", list(PROTEASES), index=list(PROTEASES).index(DEFAULT_PROTEASE))
+
+    # Browser-drawn charts by default; rendered SVG/PNG output is cached per protein and toggle state
+    chart_mode = st.sidebar.radio("Chart Rendering", charts.CHART_MODES)
+
+    # Opt-in diagnostics: spans of every stage and per-protein function, optionally with allocations,
+    # and a sampling profile of a single rerun
+    diagnostics = st.sidebar.expander("Diagnostics")
+    with diagnostics:
+        record_spans = st.checkbox("Record Instrumentation")
+        track_memory = st.checkbox("Track Allocations (slower)", disabled=not record_spans)
+        profile_rerun = st.button("Profile Next Rerun")
+
+    recorder = instrument.Recorder(memory=track_memory).start() if record_spans else None
+    profiler = instrument.SamplingProfiler().start() if profile_rerun else None
+
+    try:
+        # Every stage below is timed, and the per-protein stages are memoized on their own inputs
+        results = shared_results()
+        pipeline = Pipeline(results)
+
+        if bundle_path:
+            # Compiled bundles are memory-mapped: only the protein names are read until a protein is selected
+            try:
+                index = pipeline.run("index", None, lambda: open_bundle(bundle_path))
+            except (OSError, ValueError) as e:
+                st.error(f"Cannot open dataset bundle {bundle_path}: {e}")
+                st.stop()
+            tools = index.tools
+            st.caption(f"{len(index)} proteins, tools {", ".join(tools)}, compiled with the {index.protease} rule")
+            dataset_key = (index.dataset_id,)
+        else:
+            # Read CSV files (parsed once per upload content, then served from the ingest cache)
+            main_hash, main_df = pipeline.run("ingest", None, lambda: ingest.read_upload(main_file))
+            tool_hashes, tool_dfs = {}, {}
+            for tool, tool_file in tool_files.items():
+                if stream_peptides:
+                    tool_hashes[tool], tool_dfs[tool] = pipeline.run("ingest", None, lambda: (
+                        ingest.source_hash(tool_file), ingest.read_head(tool_file)))
+                else:
+                    tool_hashes[tool], tool_dfs[tool] = pipeline.run("ingest", None,
+                                                                     lambda: ingest.read_upload(tool_file))
+
+            # Display data samples
+            st.subheader("Main Data Sample")
+            st.dataframe(main_df.head())
+
+            tools = list(tool_files)
+            for row_start in range(0, len(tools), 2):
+                for col, tool in zip(st.columns(2), tools[row_start:row_start + 2]):
+                    with col:
+                        st.subheader(f"{tool} Sample")
+                        st.dataframe(tool_dfs[tool].head())
+
+            # Index sequences and per-tool peptides by ProteinName
+            if stream_peptides:
+                index = pipeline.run("index", None, lambda: load_index_streaming(
+                    (main_hash, main_file), {tool: (tool_hashes[tool], tool_files[tool]) for tool in tools}))
+            else:
+                index = pipeline.run("index", None, lambda: load_index(
+                    (main_hash, main_df), {tool: (tool_hashes[tool], tool_dfs[tool]) for tool in tools}))
+
+            # Per-protein results are shared between all sessions looking at the same uploads
+            dataset_key = (main_hash,) + tuple(tool_hashes.values())
+        colors = charts.tool_colors(tools)
+
+        # Proteome-wide summary (kept in the shared result cache until evicted)
+        st.subheader("Proteome Summary")
+        summary_key = dataset_key + (protease,)
+        if bundle_path and protease == index.protease:
+            # The bundle already holds the summary and tool overlap for the rule it was compiled with
+            pipeline.run("proteome_summary", summary_key, index.summary)
+            pipeline.run("tool_overlap", summary_key, index.overlap)
+        elif st.button("Analyse All Proteins"):
+            progress_bar = st.progress(0.0, text="Analysing proteins...")
+
+            def summarize():
+                # Tool-overlap counts are accumulated in the same pass over the proteome
+                overlap = OverlapCounts(tools)
+                summary = summarize_proteome(
+                    index, protease=protease, overlap=overlap, progress=lambda done, total:
+                    progress_bar.progress(done / total, text=f"Analysed {done}/{total} proteins"))
+                results.put(("tool_overlap",) + summary_key, overlap.frame())
+                return summary
+
+            pipeline.run("proteome_summary", summary_key, summarize)
+            progress_bar.empty()
+        summary_df = results.get(("proteome_summary",) + summary_key)
+        if summary_df is not None:
+            min_coverage = st.slider("Minimum Total Coverage (%)", 0.0, 100.0, 0.0)
+            st.dataframe(summary_df[summary_df["Coverage Total (%)"] >= min_coverage], hide_index=True)
+        overlap_df = results.get(("tool_overlap",) + summary_key)
+        if overlap_df is not None:
+            # Residues (and proteins) covered by exactly each combination of tools, largest first
+            with st.expander("Tool Overlap Across All Proteins"):
+                st.dataframe(overlap_df, hide_index=True)
+
+        # Dropdown for protein selection
+        selected_protein = st.selectbox("Select a Protein Name", index.names)
+
+        if selected_protein:
+            # Extract sequence and peptides
+            sequence = index.sequence(selected_protein)
+            peptides_by_tool = {tool: index.peptides(tool, selected_protein) for tool in tools}
+
+            # Match peptides and compute per-residue coverage and tool bitsets (independent of the
+            # protease rule), then classify every peptide occurrence
+            protein_key = dataset_key + (selected_protein,)
+            if bundle_path:
+                hits = pipeline.run("match", protein_key, lambda: index.hits(selected_protein))
+            else:
+                hits = pipeline.run("match", protein_key,
+                                    lambda: match_peptides(sequence, peptides_by_tool, cached=True))
+            coverage = pipeline.run("coverage", protein_key, lambda: Coverage.from_hits(len(sequence), hits, tools))
+            bits = pipeline.run("overlap", protein_key, coverage.bits)
+            protein_key += (protease,)
+            simplified_semi_tryptic_counts = pipeline.run("classify", protein_key, lambda: count_semi_tryptic(
+                sequence, peptides_by_tool, hits, protease))
+
+            # Toggle buttons for highlighting
+            highlighted = {}
+            for tool in tools:
+                state_key = f"highlight_{tool}"
+                if state_key not in st.session_state:
+                    st.session_state[state_key] = False
+                if st.button(f"Highlight {tool}"):
+                    st.session_state[state_key] = not st.session_state[state_key]
+                highlighted[tool] = st.session_state[state_key]
+
+            # Coverage from the packed per-tool bitsets
+            tool_coverage = {tool: bits.percent(tool) if highlighted[tool] else 0 for tool in tools}
+            total_coverage = bits.union_percent()
+            shared_coverage = bits.intersection_percent()
+
+            # Sequence viewer: long proteins are shown one window of residues at a time
+            st.subheader("Highlighted Protein Sequence")
+            window_start, window_stop = 0, len(sequence)
+            if st.toggle("Windowed Viewer", value=len(sequence) > WINDOW_THRESHOLD) and len(sequence) > 1:
+                window_size = min(st.number_input("Window Size (residues)", 50, 20000, WINDOW_SIZE, step=50),
+                                  len(sequence))
+                start_key = f"window_start_{selected_protein}"
+                jump_key = f"jump_peptide_{selected_protein}"
+                max_start = len(sequence) - window_size + 1
+
+                # Jump to the first occurrence of a peptide by moving the window start
+                first_hits = {}
+                for hit in hits:
+                    if hit.start < first_hits.get(hit.peptide, len(sequence)):
+                        first_hits[hit.peptide] = hit.start
+
+                def jump_to_peptide():
+                    peptide = st.session_state[jump_key]
+                    if peptide in first_hits:
+                        st.session_state[start_key] = min(first_hits[peptide] + 1, max(max_start, 1))
+
+                st.selectbox("Jump to Peptide", [""] + sorted(first_hits, key=first_hits.get), key=jump_key,
+                             on_change=jump_to_peptide)
+                if max_start > 1:
+                    window_start = st.slider("Window Start (residue)", 1, max_start, key=start_key) - 1
+                window_stop = window_start + window_size
+                st.caption(f"Residues {window_start + 1}-{window_stop} of {len(sequence)}")
+
+            # Render only the displayed window: peptides of the toggled tools plus cleavage residues
+            slots = tool_slots(tools)
+            highlight_tools = [tool for tool in tools if highlighted[tool]]
+            highlighted_seq = pipeline.run(
+                "render", protein_key + tuple(highlight_tools) + (window_start, window_stop),
+                lambda: render_sequence_html(sequence, {tool: coverage.depths[tool] for tool in highlight_tools},
+                                             protease=protease, start=window_start, stop=window_stop, slots=slots))
+
+            # Display highlighted sequence
+            if len(tools) > 2:
+                legend = " ".join(f"<span class=pe{1 << slot}>{tool}</span>" for tool, slot in slots.items())
+                st.markdown(f"{stylesheet(len(slots))}Highlight styles: {legend}", unsafe_allow_html=True)
+                if len(tools) > len(TOOL_STYLES):
+                    st.caption(f"Only the first {len(TOOL_STYLES)} tools can be highlighted in the sequence.")
+            st.markdown(f"""{stylesheet(len(slots))}<div style='font-family:monospace; font-size:18px; white-space:pre-wrap; word-wrap:break-word;'>{highlighted_seq}</div>""", unsafe_allow_html=True)
+
+            # Display coverage
+            st.subheader("Coverage")
+            for tool in tools:
+                st.write(f"Coverage {tool}: {tool_coverage[tool]:.2f}%")
+            st.write(f"Total Coverage: {total_coverage:.2f}%")
+            st.write(f"Shared Coverage ({" and ".join(tools)}): {shared_coverage:.2f}%")
+
+            # Residues covered by exactly each combination of tools
+            if len(tools) > 1:
+                with st.expander("Tool Overlap"):
+                    for tool in tools:
+                        st.write(f"Unique Coverage {tool}: {bits.unique_percent(tool):.2f}%")
+                    protein_overlap = OverlapCounts(tools)
+                    protein_overlap.add(bits.overlap_counts())
+                    st.dataframe(protein_overlap.frame().drop(columns="Proteins"), hide_index=True)
+
+            # Coverage visualization
+            chart_key = dataset_key + (protease, selected_protein)
+            pipeline.run("charts", None, lambda: show_bar_chart(
+                chart_mode, ("coverage",) + chart_key + tuple(highlighted.values()), tools + ["Total"],
+                list(tool_coverage.values()) + [total_coverage], list(colors.values()) + [charts.TOTAL_COLOR],
+                "Coverage (%)", "Coverage Comparison", xmax=100, fmt="{:.2f}%"))
+
+            # Per-residue coverage track, downsampled to a fixed number of bins for long proteins
+            st.subheader("Per-Residue Coverage")
+            if len(sequence) > OVERVIEW_BINS:
+                track_positions, track_depths = coverage.overview(OVERVIEW_BINS)
+            else:
+                track_positions, track_depths = None, coverage.depths
+            pipeline.run("charts", None, lambda: show_track(
+                chart_mode, ("track",) + chart_key + (window_start, window_stop), track_positions, track_depths,
+                colors, len(sequence), (window_start, window_stop)))
+
+            # Display Simplified-Semi-Tryptic Count
+            st.subheader("Simplified-Semi-Tryptic Count")
+            for tool in tools:
+                st.write(f"Simplified-Semi-Tryptic Peptide Count {tool}: {simplified_semi_tryptic_counts[tool]:.0f}")
+            st.write(f"Total Simplified-Semi-Tryptic Peptide Count: {sum(simplified_semi_tryptic_counts.values()):.0f}")
+
+            # N-/C-terminal tryptic status of every peptide occurrence
+            with st.expander("Per-Site Classification"):
+                st.dataframe(pipeline.run("classify_sites", protein_key,
+                                          lambda: classify_sites(sequence, hits, protease)), hide_index=True)
+
+            # # Simplified-Semi-Tryptic Histogram
+            # st.subheader("Simplified-Semi-Tryptic Peptide Count")
+            # fig, ax = plt.subplots()
+            # ax.bar(["TOOL-A", "TOOL-B"], [simplified_semi_tryptic_counts["TOOL-A"], simplified_semi_tryptic_counts["TOOL-B"]], color=["red", "blue"])
+            # ax.set_ylabel("Count")
+            # ax.set_title("Simplified-Semi-Tryptic Peptide Count by Tool")
+            # st.pyplot(fig)
+
+            # Coverage visualization
+            pipeline.run("charts", None, lambda: show_bar_chart(
+                chart_mode, ("semi_tryptic",) + chart_key, tools + ["Total"],
+                [simplified_semi_tryptic_counts[tool] for tool in tools]
+                + [sum(simplified_semi_tryptic_counts.values())],
+                list(colors.values()) + [charts.TOTAL_COLOR], "Count", "Simplified-Semi-Tryptic Peptide Count",
+                fmt="{:.0f}"))
+    finally:
+        # Reruns that end early (st.stop, a widget-triggered rerun, an exception) must not leave
+        # the profiler thread, the recorder or tracemalloc running for the whole process
+        if profiler is not None:
+            profiler.stop()
+        if recorder is not None:
+            recorder.stop()
+
+    # Per-stage timings of this rerun, plus the recorded spans and profile when enabled
+    with diagnostics:
+        st.write(f"Stage Timings (total {pipeline.total_seconds * 1000:.1f} ms)")
+        st.dataframe(pipeline.timings_frame(), hide_index=True)
+        # Shared by every session of this server process
+        cache_stats = results.stats()
+        st.caption(f"Result cache: {cache_stats['entries']} entries, {cache_stats['bytes'] / 2 ** 20:.1f} MB, "
+                   f"{cache_stats['hits']} hits, {cache_stats['misses']} misses")
+        if recorder is not None:
+            st.write("Instrumented Functions")
+            st.dataframe(recorder.stats_frame(), hide_index=True)
+            st.download_button("Download JSON", json.dumps(recorder.to_dict()), "diagnostics.json",
+                               mime="application/json", on_click="ignore")
+            st.download_button("Download Chrome Trace", json.dumps(recorder.chrome_trace()), "trace.json",
+                               mime="application/json", on_click="ignore")
+        if profiler is not None:
+            st.write(f"Sampling Profile ({profiler.samples} samples)")
+            st.dataframe(profiler.top(), hide_index=True)
+            st.download_button("Download Folded Stacks", profiler.collapsed(), "profile.folded",
+                               mime="text/plain", on_click="ignore")
@@ -0,0 +1,36 @@
+"""Core engine for the proteomics exploration app.
+
+Importable without streamlit or matplotlib; the Streamlit scripts and the
+``python -m proteomics_explore`` command line are thin layers on top.
+"""
+from .analysis import ProteinAnalysis, analyze_protein
+from .batch import summarize_proteome
+from .bundle import Bundle, compile_bundle, open_bundle
+from .classify import PROTEASES, ProteaseRule, classify_simplified_semi_tryptic
+from .coverage import Coverage
+from .index import ProteinIndex, load_index
+from .ingest import read_upload
+from .matcher import Hit, PeptideMatcher
+from .overlap import CoverageBits, OverlapCounts
+from .render import render_sequence_html
+
+__all__ = [
+    "Bundle",
+    "Coverage",
+    "CoverageBits",
+    "Hit",
+    "OverlapCounts",
+    "PROTEASES",
+    "PeptideMatcher",
+    "ProteaseRule",
+    "ProteinAnalysis",
+    "ProteinIndex",
+    "analyze_protein",
+    "classify_simplified_semi_tryptic",
+    "compile_bundle",
+    "load_index",
+    "open_bundle",
+    "read_upload",
+    "render_sequence_html",
+    "summarize_proteome",
+]
@@ -0,0 +1,73 @@
+"""Per-protein analysis: matching, coverage and semi-tryptic counts."""
+from .classify import DEFAULT_PROTEASE, count_simplified_semi_tryptic
+from .coverage import Coverage
+from .instrument import traced
+from .matcher import PeptideMatcher, get_matcher
+
+
+class ProteinAnalysis:
+    """Hits, coverage and simplified-semi-tryptic counts of one protein."""
+
+    def __init__(self, name, sequence, peptides_by_tool, hits, coverage, semi_tryptic_counts,
+                 protease=DEFAULT_PROTEASE):
+        self.name = name
+        self.sequence = sequence
+        self.peptides_by_tool = peptides_by_tool
+        self.hits = hits
+        self.coverage = coverage
+        self.semi_tryptic_counts = semi_tryptic_counts
+        self.protease = protease
+        self._bits = None
+
+    @property
+    def tools(self):
+        return list(self.peptides_by_tool)
+
+    @property
+    def bits(self):
+        """Packed per-tool coverage (:class:`proteomics_explore.overlap.CoverageBits`), built on first use."""
+        if self._bits is None:
+            self._bits = self.coverage.bits()
+        return self._bits
+
+    def summary(self):
+        """Flat summary row as used by the proteome table and the CLI output."""
+        row = {"ProteinName": self.name, "Length": len(self.sequence)}
+        bits = self.bits
+        for tool in self.tools:
+            row[f"Peptides {tool}"] = len(self.peptides_by_tool[tool])
+            row[f"Coverage {tool} (%)"] = bits.percent(tool)
+            row[f"Coverage Unique {tool} (%)"] = bits.unique_percent(tool)
+            row[f"Semi-Tryptic {tool}"] = self.semi_tryptic_counts[tool]
+        row["Coverage Total (%)"] = bits.union_percent()
+        row["Coverage Shared (%)"] = bits.intersection_percent()
+        row["Semi-Tryptic Total"] = sum(self.semi_tryptic_counts.values())
+        return row
+
+
+@traced
+def match_peptides(sequence, peptides_by_tool, cached=False):
+    """Hits of every peptide of every tool in ``sequence``.
+
+    ``cached=True`` reuses the matcher for an identical peptide set across
+    calls, which pays off when the same protein is analysed repeatedly (as in
+    the app) but only costs memory in a one-off batch run.
+    """
+    matcher = get_matcher(peptides_by_tool) if cached else PeptideMatcher(peptides_by_tool)
+    return matcher.find(sequence)
+
+
+@traced
+def count_semi_tryptic(sequence, peptides_by_tool, hits, protease=DEFAULT_PROTEASE):
+    """``{tool: simplified-semi-tryptic peptide count}``."""
+    return {tool: count_simplified_semi_tryptic(sequence, peptides, hits, tool, protease)
+            for tool, peptides in peptides_by_tool.items()}
+
+
+@traced
+def analyze_protein(name, sequence, peptides_by_tool, protease=DEFAULT_PROTEASE, cached=False):
+    """Run the per-protein analysis (matching, coverage and classification) in one go."""
+    hits = match_peptides(sequence, peptides_by_tool, cached)
+    coverage = Coverage.from_hits(len(sequence), hits, list(peptides_by_tool))
+    semi = count_semi_tryptic(sequence, peptides_by_tool, hits, protease)
+    return ProteinAnalysis(name, sequence, peptides_by_tool, hits, coverage, semi, protease)
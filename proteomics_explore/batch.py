@@ -0,0 +1,127 @@
+"""Proteome-wide coverage and semi-tryptic statistics.
+
+Proteins are processed in chunks on a process pool. Each worker receives the
+sequences and peptides of its chunk only and returns one summary row per
+protein plus the tool-overlap counts of the chunk, so nothing large is shared
+between processes.
+"""
+import multiprocessing
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from functools import partial
+
+import pandas as pd
+
+from .analysis import analyze_protein
+from .classify import DEFAULT_PROTEASE
+from .instrument import traced
+from .overlap import OverlapCounts
+
+CHUNK_SIZE = 500
+MAX_CHUNKS_PER_WORKER = 2
+
+
+def _summarize_chunk(chunk, protease=DEFAULT_PROTEASE, analyses=None):
+    # ``analyses`` collects every ProteinAnalysis for callers that need more than the summary rows
+    rows = []
+    overlap = OverlapCounts(chunk[0][2]) if chunk else None
+    for item in chunk:
+        analysis = analyze_protein(*item, protease=protease)
+        rows.append(analysis.summary())
+        overlap.add(analysis.bits.overlap_counts())
+        if analyses is not None:
+            analyses.append(analysis)
+    return rows, overlap
+
+
+def iter_chunks(index, chunk_size=CHUNK_SIZE):
+    """Chunks of ``(name, sequence, {tool: peptides})`` work items from a :class:`ProteinIndex`."""
+    for begin in range(0, len(index), chunk_size):
+        chunk = []
+        for i in range(begin, min(begin + chunk_size, len(index))):
+            peptides = {tool: list(groups.get(i)) for tool, groups in index.groups.items()}
+            chunk.append((index.names[i], index.sequences[i], peptides))
+        yield chunk
+
+
+def _pool_context():
+    # Forking the multi-threaded Streamlit server would copy locks held by other threads (and their
+    # active recorders) into the workers; a fork server with this module preloaded avoids that cheaply
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("forkserver")
+        context.set_forkserver_preload([__name__])
+        return context
+    return multiprocessing.get_context("spawn")
+
+
+def map_chunks(index, func, workers=None, chunk_size=CHUNK_SIZE, progress=None):
+    """Yield ``func(chunk)`` for every chunk of ``index`` (see :func:`iter_chunks`), in index order.
+
+    ``func`` runs on a process pool, so it must be picklable (a module-level
+    function or a ``functools.partial`` of one). ``progress(done, total)`` is
+    called with the number of proteins processed after every chunk.
+    ``workers=1`` runs everything in the calling process.
+    """
+    total = len(index)
+    chunks = iter_chunks(index, chunk_size)
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or total <= chunk_size:
+        done = 0
+        for chunk in chunks:
+            result = func(chunk)
+            done += len(chunk)
+            if progress:
+                progress(done, total)
+            yield result
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=_pool_context()) as pool:
+        numbered = enumerate(chunks)
+        futures = {}
+        pending = {}
+        next_chunk = 0
+        done = 0
+        while True:
+            # Chunks are built lazily, at most MAX_CHUNKS_PER_WORKER per worker at a time (running or waiting
+            # for their predecessors), so a spilled index is read from disk as the pool works through it
+            while len(futures) + len(pending) < MAX_CHUNKS_PER_WORKER * workers:
+                item = next(numbered, None)
+                if item is None:
+                    break
+                n, chunk = item
+                futures[pool.submit(func, chunk)] = (n, len(chunk))
+            if not futures:
+                break
+            finished, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in finished:
+                n, size = futures.pop(future)
+                done += size
+                if progress:
+                    progress(done, total)
+                pending[n] = future.result()
+            # Release finished chunks in order as soon as their predecessors are done
+            while next_chunk in pending:
+                yield pending.pop(next_chunk)
+                next_chunk += 1
+
+
+def iter_summaries(index, workers=None, chunk_size=CHUNK_SIZE, progress=None, protease=DEFAULT_PROTEASE,
+                   overlap=None):
+    """Yield lists of summary rows chunk by chunk, in index order (arguments as for :func:`map_chunks`).
+
+    The tool-overlap counts of every chunk are merged into ``overlap`` (an
+    :class:`proteomics_explore.overlap.OverlapCounts`) when given.
+    """
+    for rows, chunk_overlap in map_chunks(index, partial(_summarize_chunk, protease=protease), workers,
+                                          chunk_size, progress):
+        if overlap is not None and chunk_overlap is not None:
+            overlap.merge(chunk_overlap)
+        yield rows
+
+
+@traced
+def summarize_proteome(index, workers=None, chunk_size=CHUNK_SIZE, progress=None, protease=DEFAULT_PROTEASE,
+                       overlap=None):
+    """One summary row per protein of ``index`` as a DataFrame (``overlap`` as for :func:`iter_summaries`)."""
+    rows = [row for chunk in iter_summaries(index, workers, chunk_size, progress, protease, overlap) for row in chunk]
+    return pd.DataFrame(rows)
@@ -0,0 +1,174 @@
+"""Benchmark harness for the analysis stages on synthetic data.
+
+For each scale (number of proteins, mean sequence length, peptides per
+protein and tool) a dataset is generated with :mod:`proteomics_explore.synthetic`
+and every stage is run over the whole proteome: CSV parsing, index build,
+peptide matching, coverage, semi-tryptic classification, HTML rendering and
+the single-process batch summary. Each stage is timed (best of ``repeat``
+runs) and then run once more under ``tracemalloc`` to record its peak
+allocation, so tracing overhead never shows up in the timings. Results are
+plain dicts, saved as JSON and compared against a baseline run stage by stage.
+"""
+import json
+import platform
+import time
+import tracemalloc
+from collections import namedtuple
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from .analysis import count_semi_tryptic, match_peptides
+from .batch import iter_chunks, summarize_proteome
+from .classify import DEFAULT_PROTEASE, cleavage_index
+from .coverage import Coverage
+from .index import ProteinIndex
+from .ingest import parse_csv
+from .render import render_sequence_html
+from .synthetic import synthetic_dataset
+
+BenchScale = namedtuple("BenchScale", ["proteins", "length", "peptides"])
+
+DEFAULT_SCALES = (
+    BenchScale(200, 400, 20),
+    BenchScale(2000, 400, 20),
+    BenchScale(200, 4000, 200),
+)
+
+# Stage timings may grow by this fraction over the baseline before counting as a regression
+TOLERANCE = 0.25
+
+
+def parse_scale(value):
+    """:class:`BenchScale` from ``PROTEINS:LENGTH:PEPTIDES``."""
+    try:
+        return BenchScale(*(int(part) for part in value.split(":")))
+    except (TypeError, ValueError):
+        raise ValueError(f"Expected PROTEINS:LENGTH:PEPTIDES, got {value!r}") from None
+
+
+def measure(func, repeat=1, memory=True):
+    """``(result, best seconds, peak bytes)`` of ``func()``; the peak is None with ``memory=False``."""
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    peak = None
+    if memory:
+        tracing = tracemalloc.is_tracing()
+        if not tracing:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        func()
+        peak = tracemalloc.get_traced_memory()[1] - baseline
+        if not tracing:
+            tracemalloc.stop()
+    return result, best, peak
+
+
+def _uncached(func):
+    # Each stage pays for its own cleavage-site arrays rather than reusing the previous stage's
+    def run():
+        cleavage_index.cache_clear()
+        return func()
+    return run
+
+
+def run_scale(scale, n_tools=2, missed_cleavages=1, semi_fraction=0.1, protease=DEFAULT_PROTEASE, seed=0,
+              repeat=1, memory=True):
+    """One result record per stage for a single :class:`BenchScale`."""
+    main_df, tool_frames = synthetic_dataset(scale.proteins, scale.length, scale.peptides, n_tools,
+                                             missed_cleavages, semi_fraction, protease, seed)
+    main_csv = main_df.to_csv(index=False).encode()
+    tool_csvs = {tool: df.to_csv(index=False).encode() for tool, df in tool_frames.items()}
+    residues = int(main_df["Sequence"].str.len().sum())
+    peptide_rows = sum(len(df) for df in tool_frames.values())
+    records = []
+
+    def record(stage, func, items, unit):
+        result, seconds, peak = measure(_uncached(func), repeat, memory)
+        records.append({
+            "proteins": scale.proteins, "length": scale.length, "peptides": scale.peptides,
+            "residues": residues, "peptide_rows": peptide_rows, "stage": stage,
+            "seconds": seconds, "items": items, "unit": unit,
+            "throughput": items / seconds if seconds > 0 else None,
+            "peak_mb": peak / 2 ** 20 if peak is not None else None,
+        })
+        return result
+
+    main, tools = record("ingest", lambda: (parse_csv(main_csv), {tool: parse_csv(data)
+                                                                    for tool, data in tool_csvs.items()}),
+                         len(main_df) + peptide_rows, "rows")
+    index = record("index", lambda: ProteinIndex.build(main, tools), scale.proteins, "proteins")
+    items = next(iter_chunks(index, max(len(index), 1)), [])
+    hits = record("match", lambda: [match_peptides(sequence, peptides) for _, sequence, peptides in items],
+                  residues, "residues")
+    record("coverage", lambda: [Coverage.from_hits(len(sequence), protein_hits, index.tools)
+                                for (_, sequence, _), protein_hits in zip(items, hits)],
+           residues, "residues")
+    record("classify", lambda: [count_semi_tryptic(sequence, peptides, protein_hits, protease)
+                                for (_, sequence, peptides), protein_hits in zip(items, hits)],
+           peptide_rows, "peptides")
+    coverages = [Coverage.from_hits(len(sequence), protein_hits, index.tools)
+                 for (_, sequence, _), protein_hits in zip(items, hits)]
+    record("render", lambda: [render_sequence_html(sequence, coverage.depths, protease)
+                              for (_, sequence, _), coverage in zip(items, coverages)],
+           residues, "residues")
+    record("summary", lambda: summarize_proteome(index, workers=1, protease=protease), scale.proteins, "proteins")
+    return records
+
+
+def run_benchmark(scales=DEFAULT_SCALES, n_tools=2, missed_cleavages=1, semi_fraction=0.1,
+                  protease=DEFAULT_PROTEASE, seed=0, repeat=1, memory=True, progress=None):
+    """Benchmark every scale; returns a JSON-serialisable dict with the environment and all records.
+
+    ``progress(scale)`` is called before each scale is run.
+    """
+    parameters = {"scales": [scale._asdict() for scale in scales], "tools": n_tools,
+                  "missed_cleavages": missed_cleavages, "semi_fraction": semi_fraction,
+                  "protease": protease, "seed": seed, "repeat": repeat, "memory": memory}
+    results = []
+    for scale in scales:
+        if progress:
+            progress(scale)
+        results.extend(run_scale(scale, n_tools, missed_cleavages, semi_fraction, protease, seed, repeat, memory))
+    return {
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "environment": {"python": platform.python_version(), "numpy": np.__version__,
+                        "pandas": pd.__version__, "platform": platform.platform()},
+        "parameters": parameters,
+        "results": results,
+    }
+
+
+def save_results(results, path):
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2)
+
+
+def load_results(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def results_frame(results):
+    """Records of a benchmark run as a DataFrame, one row per scale and stage."""
+    return pd.DataFrame(results["results"])
+
+
+def compare(baseline, current, tolerance=TOLERANCE):
+    """Stage timings of two runs side by side, for every scale and stage present in both.
+
+    ``ratio`` is current over baseline seconds; a stage is a regression when
+    it exceeds ``1 + tolerance``.
+    """
+    keys = ["proteins", "length", "peptides", "stage"]
+    merged = results_frame(baseline)[keys + ["seconds"]].merge(
+        results_frame(current)[keys + ["seconds"]], on=keys, suffixes=("_baseline", "_current"))
+    merged["ratio"] = merged["seconds_current"] / merged["seconds_baseline"]
+    merged["regression"] = merged["ratio"] > 1 + tolerance
+    return merged
@@ -0,0 +1,314 @@
+"""Compiled dataset bundles: a proteome, its tool peptides and precomputed matches on disk.
+
+A bundle is a directory of ``.npy`` files plus ``meta.json``:
+
+* ``names`` and ``sequences``: all strings concatenated into one byte buffer
+  with an offsets array (``*_offsets``), so string ``i`` is
+  ``buffer[offsets[i]:offsets[i + 1]]``;
+* per tool ``n``: the peptides (``peptides_n`` with ``peptides_n_offsets``)
+  grouped by protein through a CSR offsets array (``groups_n``), as in
+  :class:`proteomics_explore.index.PeptideGroups`;
+* per tool ``n``: every match position (``match_starts_n``) with the index
+  of the matching peptide (``match_peptides_n``), again grouped by protein
+  (``matches_n``);
+* the per-protein summary table (``summary``) for the protease rule the
+  bundle was compiled with, and the proteome-wide tool overlap in ``meta.json``.
+
+Arrays are opened with ``np.load(mmap_mode="r")``: opening a bundle reads
+only the protein names, and looking at one protein touches only the pages
+holding its sequence, peptides and matches. :class:`Bundle` has the
+interface of :class:`proteomics_explore.index.ProteinIndex`, so the app, the
+batch summary and the CLI use a bundle wherever they use an index.
+"""
+import json
+import os
+import shutil
+import uuid
+from functools import lru_cache, partial
+
+import numpy as np
+import pandas as pd
+
+from .batch import CHUNK_SIZE, _summarize_chunk, map_chunks
+from .classify import DEFAULT_PROTEASE
+from .index import PeptideGroups, ProteinIndex
+from .instrument import traced
+from .matcher import Hit
+from .overlap import OverlapCounts
+
+FORMAT_VERSION = 1
+META_FILE = "meta.json"
+
+
+class StringArray:
+    """Strings stored as one UTF-8 byte buffer plus an offsets array; items are decoded on access."""
+
+    def __init__(self, buffer, offsets):
+        self.buffer = buffer
+        self.offsets = offsets
+
+    @staticmethod
+    def encode(strings):
+        """``(buffer, offsets)`` arrays for ``strings``."""
+        encoded = [s.encode() for s in strings]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(s) for s in encoded], out=offsets[1:])
+        return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def _decode(self, start, end):
+        return self.buffer[start:end].tobytes().decode()
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            start, stop, step = i.indices(len(self))
+            if step != 1:
+                raise ValueError("StringArray slices must be contiguous")
+            bounds = self.offsets[start:stop + 1].tolist() if stop > start else []
+            if not bounds:
+                return np.array([], dtype=object)
+            text = self._decode(bounds[0], bounds[-1])
+            if len(text) != bounds[-1] - bounds[0]:
+                # Byte offsets index characters only for ASCII text; decode entries one by one otherwise
+                return np.array([self._decode(a, b) for a, b in zip(bounds[:-1], bounds[1:])], dtype=object)
+            base = bounds[0]
+            return np.array([text[a - base:b - base] for a, b in zip(bounds[:-1], bounds[1:])], dtype=object)
+        if i < 0:
+            i += len(self)
+        return self._decode(self.offsets[i], self.offsets[i + 1])
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    @property
+    def nbytes(self):
+        return self.buffer.nbytes + self.offsets.nbytes
+
+
+def _load(path, name):
+    file = os.path.join(path, f"{name}.npy")
+    try:
+        return np.load(file, mmap_mode="r")
+    except ValueError:
+        # Zero-length arrays cannot be memory-mapped
+        return np.load(file)
+
+
+def _save(path, name, array):
+    np.save(os.path.join(path, f"{name}.npy"), np.ascontiguousarray(array))
+
+
+class Bundle(ProteinIndex):
+    """A compiled bundle opened from disk, usable wherever a :class:`ProteinIndex` is.
+
+    Additionally offers the precomputed :meth:`hits` of every protein and the
+    :meth:`summary` and :meth:`overlap` tables of the compile-time protease rule.
+    """
+
+    def __init__(self, path):
+        with open(os.path.join(path, META_FILE)) as f:
+            self.meta = json.load(f)
+        if self.meta.get("format") != FORMAT_VERSION:
+            raise ValueError(f"{path} is not a version {FORMAT_VERSION} dataset bundle")
+        self.path = path
+        names = np.array(list(StringArray(_load(path, "names"), _load(path, "names_offsets"))), dtype=object)
+        sequences = StringArray(_load(path, "sequences"), _load(path, "sequences_offsets"))
+        groups = {}
+        self._matches = {}
+        for n, tool in enumerate(self.meta["tools"]):
+            peptides = StringArray(_load(path, f"peptides_{n}"), _load(path, f"peptides_{n}_offsets"))
+            groups[tool] = PeptideGroups(_load(path, f"groups_{n}"), peptides)
+            self._matches[tool] = (_load(path, f"matches_{n}"), _load(path, f"match_starts_{n}"),
+                                   _load(path, f"match_peptides_{n}"))
+        super().__init__(names, sequences, groups)
+
+    @property
+    def dataset_id(self):
+        """Identifier that changes whenever the bundle is recompiled."""
+        return self.meta["id"]
+
+    @property
+    def protease(self):
+        return self.meta["protease"]
+
+    @property
+    def nbytes(self):
+        # Only the names are held in memory; everything else is mapped from disk
+        return sum(len(name) for name in self.names) + self.names.nbytes
+
+    def hits(self, name):
+        """Precomputed :class:`proteomics_explore.matcher.Hit` list of protein ``name``."""
+        i = self.position(name)
+        hits = []
+        for tool, (offsets, starts, peptide_ids) in self._matches.items():
+            peptides = self.groups[tool].peptides
+            begin, end = offsets[i], offsets[i + 1]
+            for start, peptide_id in zip(starts[begin:end].tolist(), peptide_ids[begin:end].tolist()):
+                peptide = peptides[peptide_id]
+                hits.append(Hit(peptide, start, start + len(peptide), tool))
+        return hits
+
+    def summary(self, protease=None):
+        """Per-protein summary table, or None when ``protease`` differs from the compile-time rule."""
+        if protease is not None and protease != self.protease:
+            return None
+        values = _load(self.path, "summary")
+        df = pd.DataFrame(np.asarray(values), columns=self.meta["summary_columns"])
+        df = df.astype(dict(zip(self.meta["summary_columns"], self.meta["summary_dtypes"])))
+        df.insert(0, "ProteinName", self.names)
+        return df
+
+    def overlap(self):
+        """Residues and proteins covered by each exact combination of tools, as in :meth:`OverlapCounts.frame`."""
+        return pd.DataFrame(self.meta["overlap"])
+
+
+def _match_positions(analysis):
+    # Match positions by tool, with the matched peptide as its position in the protein's peptide group
+    local = {tool: {peptide: j for j, peptide in enumerate(peptides)}
+             for tool, peptides in analysis.peptides_by_tool.items()}
+    positions = {tool: [] for tool in analysis.peptides_by_tool}
+    for hit in sorted(analysis.hits, key=lambda hit: hit.start):
+        positions[hit.tool].append((hit.start, local[hit.tool][hit.peptide]))
+    return positions
+
+
+def _compile_chunk(chunk, protease=DEFAULT_PROTEASE):
+    analyses = []
+    rows, overlap = _summarize_chunk(chunk, protease, analyses)
+    return rows, overlap, [_match_positions(analysis) for analysis in analyses]
+
+
+class _ArrayWriter:
+    """A ``.npy`` array written chunk by chunk along its first axis."""
+
+    def __init__(self, path, name, dtype, shape=()):
+        self.path = os.path.join(path, f"{name}.npy")
+        self.dtype = np.dtype(dtype)
+        self.shape = shape
+        self.length = 0
+        self._raw = open(f"{self.path}.part", "wb")
+
+    def append(self, values):
+        values = np.asarray(values, dtype=self.dtype).reshape((-1,) + self.shape)
+        self._raw.write(values.tobytes())
+        self.length += len(values)
+
+    def close(self):
+        # The header needs the final length, so it is written in front of the raw data at the end
+        self._raw.close()
+        header = {"descr": np.lib.format.dtype_to_descr(self.dtype), "fortran_order": False,
+                  "shape": (self.length,) + self.shape}
+        with open(self.path, "wb") as f, open(f"{self.path}.part", "rb") as raw:
+            np.lib.format.write_array_header_1_0(f, header)
+            shutil.copyfileobj(raw, f)
+        os.remove(f"{self.path}.part")
+
+
+class _ToolWriter:
+    """Peptide groups and match positions of tool ``n``, appended chunk by chunk in protein order."""
+
+    def __init__(self, path, n, n_proteins):
+        self.path = path
+        self.n = n
+        self.peptides = _ArrayWriter(path, f"peptides_{n}", np.uint8)
+        self.peptide_offsets = _ArrayWriter(path, f"peptides_{n}_offsets", np.int64)
+        self.peptide_offsets.append([0])
+        self.match_starts = _ArrayWriter(path, f"match_starts_{n}", np.int32)
+        self.match_peptides = _ArrayWriter(path, f"match_peptides_{n}", np.int64)
+        self.groups = np.zeros(n_proteins + 1, dtype=np.int64)
+        self.matches = np.zeros(n_proteins + 1, dtype=np.int64)
+
+    def append(self, first, peptides, positions):
+        """Peptides and ``(start, local peptide position)`` matches of proteins ``first``, ``first + 1``, ..."""
+        last = first + len(peptides)
+        buffer, offsets = StringArray.encode([peptide for group in peptides for peptide in group])
+        self.peptide_offsets.append(offsets[1:] + self.peptides.length)
+        self.peptides.append(buffer)
+        np.cumsum([len(group) for group in peptides], out=self.groups[first + 1:last + 1])
+        self.groups[first + 1:last + 1] += self.groups[first]
+        # Peptide ids are global within the tool: group offset of the protein plus the local position
+        bases = self.groups[first:last].tolist()
+        self.match_starts.append([start for protein in positions for start, _ in protein])
+        self.match_peptides.append([base + j for base, protein in zip(bases, positions) for _, j in protein])
+        np.cumsum([len(protein) for protein in positions], out=self.matches[first + 1:last + 1])
+        self.matches[first + 1:last + 1] += self.matches[first]
+
+    def close(self):
+        for writer in (self.peptides, self.peptide_offsets, self.match_starts, self.match_peptides):
+            writer.close()
+        _save(self.path, f"groups_{self.n}", self.groups)
+        _save(self.path, f"matches_{self.n}", self.matches)
+
+
+@traced
+def compile_bundle(index, path, protease=DEFAULT_PROTEASE, workers=None, chunk_size=CHUNK_SIZE, progress=None):
+    """Write ``index`` with its precomputed matches and summary as a bundle directory at ``path``.
+
+    Matching and summarising run as in :func:`proteomics_explore.batch.iter_summaries`,
+    and peptides, matches and summary rows are written out chunk by chunk.
+    ``meta.json`` is written last, so an interrupted compile never leaves a
+    bundle that opens.
+    """
+    os.makedirs(path, exist_ok=True)
+    if os.path.exists(os.path.join(path, META_FILE)):
+        os.remove(os.path.join(path, META_FILE))
+    tools = index.tools
+    for name, strings in (("names", index.names), ("sequences", index.sequences)):
+        buffer, offsets = StringArray.encode(strings)
+        _save(path, name, buffer)
+        _save(path, f"{name}_offsets", offsets)
+
+    writers = {tool: _ToolWriter(path, n, len(index)) for n, tool in enumerate(tools)}
+    overlap = OverlapCounts(tools)
+    summary = columns = dtypes = None
+    first = 0
+    for chunk_rows, chunk_overlap, chunk_matches in map_chunks(index, partial(_compile_chunk, protease=protease),
+                                                               workers, chunk_size, progress):
+        if chunk_overlap is not None:
+            overlap.merge(chunk_overlap)
+        rows = pd.DataFrame(chunk_rows).drop(columns="ProteinName")
+        if summary is None:
+            columns, dtypes = list(rows.columns), [str(dtype) for dtype in rows.dtypes]
+            summary = _ArrayWriter(path, "summary", np.float64, (len(columns),))
+        summary.append(rows[columns].to_numpy(dtype=np.float64))
+        last = first + len(chunk_matches)
+        for tool, writer in writers.items():
+            writer.append(first, [index.groups[tool].get(i) for i in range(first, last)],
+                          [positions[tool] for positions in chunk_matches])
+        first = last
+    for writer in writers.values():
+        writer.close()
+    if summary is None:
+        columns, dtypes = [], []
+        _save(path, "summary", np.zeros((0, 0), dtype=np.float64))
+    else:
+        summary.close()
+
+    meta = {
+        "format": FORMAT_VERSION,
+        "id": uuid.uuid4().hex,
+        "tools": tools,
+        "proteins": len(index),
+        "protease": protease,
+        "summary_columns": columns,
+        "summary_dtypes": dtypes,
+        "overlap": overlap.frame().to_dict("list"),
+    }
+    with open(os.path.join(path, META_FILE), "w") as f:
+        json.dump(meta, f, indent=2)
+    return open_bundle(path)
+
+
+@lru_cache(maxsize=8)
+def _open_bundle(path, bundle_id):
+    return Bundle(path)
+
+
+def open_bundle(path):
+    """Cached :class:`Bundle` for ``path``; a recompiled bundle (with a new id) is opened afresh."""
+    path = os.path.abspath(path)
+    with open(os.path.join(path, META_FILE)) as f:
+        return _open_bundle(path, json.load(f)["id"])
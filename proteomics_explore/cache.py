@@ -0,0 +1,249 @@
+"""Bounded in-process caches shared by the ingestion and analysis layers.
+
+Module-level caches live as long as the server process, so every Streamlit
+session served by that process shares them. :class:`ResultCache` adds what a
+multi-user deployment needs for per-protein results: time-based expiry, one
+computation per key even when several sessions ask at once, and an optional
+SQLite file that other processes and restarts can read.
+"""
+import hashlib
+import os
+import pickle
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+
+def sizeof(value):
+    """Best-effort size in bytes of a cached value; lists, tuples and dicts include their items."""
+    if hasattr(value, "memory_usage"):
+        usage = value.memory_usage(deep=True)
+        return int(usage.sum()) if hasattr(usage, "sum") else int(usage)
+    if hasattr(value, "nbytes"):
+        return int(value.nbytes)
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(sizeof(item) for item in value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(sizeof(key) + sizeof(item) for key, item in value.items())
+    return sys.getsizeof(value)
+
+
+class LRUCache:
+    """Mapping bounded by the total size of its values, evicting least recently used first.
+
+    With ``ttl`` (seconds) set, entries older than ``ttl`` are treated as missing.
+    """
+
+    def __init__(self, max_bytes, sizeof=sizeof, ttl=None):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._sizeof = sizeof
+        self._data = OrderedDict()
+        self._sizes = {}
+        self._stored = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._data and not self._expired(key)
+
+    def __len__(self):
+        return len(self._data)
+
+    @property
+    def nbytes(self):
+        return self._bytes
+
+    def _expired(self, key):
+        return self.ttl is not None and time.monotonic() - self._stored[key] > self.ttl
+
+    def _remove(self, key):
+        del self._data[key]
+        del self._stored[key]
+        self._bytes -= self._sizes.pop(key)
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._data:
+                return default
+            if self._expired(key):
+                self._remove(key)
+                return default
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def put(self, key, value):
+        size = self._sizeof(value)
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            # A value larger than the whole budget is returned to the caller but never kept
+            if size > self.max_bytes:
+                return value
+            self._data[key] = value
+            self._sizes[key] = size
+            self._stored[key] = time.monotonic()
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                self._remove(next(iter(self._data)))
+        return value
+
+    def resize(self, max_bytes):
+        with self._lock:
+            self.max_bytes = max_bytes
+            while self._data and self._bytes > self.max_bytes:
+                self._remove(next(iter(self._data)))
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._sizes.clear()
+            self._stored.clear()
+            self._bytes = 0
+
+
+class SQLiteStore:
+    """Pickled values in a local SQLite file, bounded in total size and evicted least recently used first."""
+
+    def __init__(self, path, max_bytes, ttl=None):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, value BLOB, "
+                           "size INTEGER, stored REAL, accessed REAL)")
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute("SELECT value, stored FROM results WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            now = time.time()
+            if self.ttl is not None and now - row[1] > self.ttl:
+                self._conn.execute("DELETE FROM results WHERE key = ?", (key,))
+                return None
+            self._conn.execute("UPDATE results SET accessed = ? WHERE key = ?", (now, key))
+        return pickle.loads(row[0])
+
+    def put(self, key, value):
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(blob) > self.max_bytes:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)",
+                               (key, blob, len(blob), now, now))
+            total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+            if total > self.max_bytes:
+                self._evict(total)
+
+    def _evict(self, total):
+        if self.ttl is not None:
+            self._conn.execute("DELETE FROM results WHERE stored < ?", (time.time() - self.ttl,))
+            total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        for key, size in self._conn.execute("SELECT key, size FROM results ORDER BY accessed").fetchall():
+            if total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM results WHERE key = ?", (key,))
+            total -= size
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM results")
+
+
+class ResultCache:
+    """Cross-session cache of computed results, keyed by tuples such as ``(kind, dataset hash, protein, params)``.
+
+    Values live in a size-bounded in-memory LRU and, when a ``disk_path`` is
+    given, in a :class:`SQLiteStore` behind it.
+    """
+
+    def __init__(self, max_bytes, ttl=None, disk_path=None, disk_max_bytes=None):
+        self.memory = LRUCache(max_bytes, ttl=ttl)
+        self.disk = SQLiteStore(disk_path, disk_max_bytes or 4 * max_bytes, ttl) if disk_path else None
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def disk_key(key):
+        return hashlib.blake2b(repr(key).encode(), digest_size=20).hexdigest()
+
+    def get(self, key, default=None):
+        value = self.memory.get(key)
+        if value is None and self.disk is not None:
+            value = self.disk.get(self.disk_key(key))
+            if value is not None:
+                self.memory.put(key, value)
+        return default if value is None else value
+
+    def put(self, key, value):
+        self.memory.put(key, value)
+        if self.disk is not None:
+            self.disk.put(self.disk_key(key), value)
+        return value
+
+    def get_or_compute(self, key, compute):
+        """Cached value for ``key``; concurrent callers with the same key wait for one ``compute()``."""
+        value = self.get(key)
+        if value is not None:
+            self._count(hit=True)
+            return value
+        with self._lock:
+            lock = self._inflight.setdefault(key, threading.Lock())
+        with lock:
+            value = self.get(key)
+            self._count(hit=value is not None)
+            if value is None:
+                value = self.put(key, compute())
+        with self._lock:
+            self._inflight.pop(key, None)
+        return value
+
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def stats(self):
+        """Hits and misses of :meth:`get_or_compute` so far, with the entries and bytes held in memory."""
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        return {"hits": hits, "misses": misses, "entries": len(self.memory), "bytes": self.memory.nbytes}
+
+    def clear(self):
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+
+_results = None
+_results_lock = threading.Lock()
+
+
+def shared_results():
+    """Process-wide :class:`ResultCache`, configured from the environment on first use.
+
+    ``PROTEOMICS_RESULT_CACHE_MB`` (default 512) bounds memory,
+    ``PROTEOMICS_RESULT_TTL`` sets an expiry in seconds and
+    ``PROTEOMICS_RESULT_DB`` names a SQLite file for the on-disk copy.
+    """
+    global _results
+    with _results_lock:
+        if _results is None:
+            ttl = os.environ.get("PROTEOMICS_RESULT_TTL")
+            _results = ResultCache(int(os.environ.get("PROTEOMICS_RESULT_CACHE_MB", "512")) * 1024 * 1024,
+                                   ttl=float(ttl) if ttl else None,
+                                   disk_path=os.environ.get("PROTEOMICS_RESULT_DB") or None)
+    return _results
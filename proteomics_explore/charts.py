@@ -0,0 +1,172 @@
+"""Chart rendering for the app with cached output.
+
+Three rendering paths are offered:
+
+* ``native``: the data is handed to Streamlit's built-in (Vega-Lite) charts
+  and drawn by the browser;
+* ``svg``: a small hand-built SVG, no plotting library involved;
+* ``matplotlib``: a PNG rendered with the Agg backend.
+
+Rendered SVG and PNG output is cached by the caller's key (protein, toggle
+state, input hashes), so reruns that do not change a chart reuse it. Figures
+are created through the object-oriented ``Figure`` API rather than pyplot and
+cleared as soon as they are saved, so no figure outlives the call that made
+it. matplotlib is only imported in the matplotlib path.
+"""
+import html
+import io
+
+import numpy as np
+import pandas as pd
+
+from .cache import LRUCache
+from .instrument import traced
+
+CHART_MODES = ("native", "svg", "matplotlib")
+
+# Colour of each tool in upload order (matching the sequence highlight of the first two)
+TOOL_COLORS = ("#ff0000", "#0000ff", "#ff8c00", "#800080", "#a0522d", "#008080", "#ff1493", "#808000")
+TOTAL_COLOR = "#008000"
+
+_rendered = LRUCache(64 * 1024 * 1024)
+
+
+def cached_render(key, render):
+    """Return the cached output for ``key``, calling ``render()`` on a miss."""
+    output = _rendered.get(key)
+    if output is None:
+        output = _rendered.put(key, render())
+    return output
+
+
+def tool_colors(tools):
+    """``{tool: colour}`` for tools in upload order."""
+    return {tool: TOOL_COLORS[n % len(TOOL_COLORS)] for n, tool in enumerate(tools)}
+
+
+def _mirrored(n, count):
+    # With exactly two tools the second is drawn below the axis; more tools share the upper half
+    return count == 2 and n == 1
+
+
+def bar_data(labels, values, colors):
+    """Data frame for ``st.bar_chart`` (native mode)."""
+    return pd.DataFrame({"label": labels, "value": values, "color": colors})
+
+
+def track_data(depths, colors, positions=None):
+    """Data frame for ``st.area_chart`` (native mode); of two tools the second is drawn below the axis.
+
+    ``positions`` are the 0-based residue positions of the values (bin starts
+    for a downsampled overview); by default every residue.
+    """
+    columns = {}
+    for n, (tool, depth) in enumerate(depths.items()):
+        columns[tool] = -depth if _mirrored(n, len(depths)) else depth
+    df = pd.DataFrame(columns)
+    df.index = (df.index if positions is None else pd.Index(positions)) + 1
+    df.index.name = "Residue"
+    return df
+
+
+@traced
+def bar_chart_svg(labels, values, colors, xlabel, title, xmax=None, fmt="{:.2f}", width=900):
+    row_height, label_width, top, bottom = 24, 70, 24, 30
+    plot_width = width - label_width - 60
+    height = top + row_height * len(labels) + bottom
+    xmax = xmax or max(max(values, default=0), 1)
+    parts = [f"<svg xmlns='http://www.w3.org/2000/svg' width='{width}' height='{height}' "
+             f"font-family='sans-serif' font-size='12'>",
+             f"<text x='{width / 2}' y='16' text-anchor='middle' font-size='14'>{html.escape(title)}</text>"]
+    for n, (label, value, color) in enumerate(zip(labels, values, colors)):
+        y = top + n * row_height
+        bar = plot_width * min(value, xmax) / xmax
+        parts.append(f"<text x='{label_width - 6}' y='{y + 16}' text-anchor='end'>{html.escape(label)}</text>"
+                     f"<rect x='{label_width}' y='{y + 4}' width='{bar:.1f}' height='{row_height - 8}' fill='{color}'/>"
+                     f"<text x='{label_width + bar + 4:.1f}' y='{y + 16}'>{html.escape(fmt.format(value))}</text>")
+    axis_y = top + row_height * len(labels)
+    parts.append(f"<line x1='{label_width}' y1='{axis_y}' x2='{label_width + plot_width}' y2='{axis_y}' stroke='black'/>"
+                 f"<text x='{label_width + plot_width / 2}' y='{axis_y + 20}' text-anchor='middle'>"
+                 f"{html.escape(xlabel)}</text></svg>")
+    return "".join(parts)
+
+
+def _step_path(depth, x_scale, y_scale, y0, sign):
+    # Only the residues where the depth changes become path vertices
+    changes = np.flatnonzero(np.diff(depth)) + 1
+    starts = np.concatenate(([0], changes))
+    ends = np.concatenate((changes, [len(depth)]))
+    points = [f"M0,{y0}"]
+    for start, end, value in zip(starts.tolist(), ends.tolist(), depth[starts].tolist()):
+        y = y0 - sign * value * y_scale
+        points.append(f"L{start * x_scale:.1f},{y:.1f}L{end * x_scale:.1f},{y:.1f}")
+    points.append(f"L{len(depth) * x_scale:.1f},{y0}Z")
+    return "".join(points)
+
+
+@traced
+def track_svg(depths, colors, width=900, height=120, window=None):
+    """Coverage track; ``window=(start, stop)`` as fractions of the protein length is outlined."""
+    length = max((len(depth) for depth in depths.values()), default=0)
+    peak = max((int(depth.max()) for depth in depths.values() if len(depth)), default=0)
+    x_scale = width / max(length, 1)
+    y_scale = (height / 2 - 4) / max(peak, 1)
+    parts = [f"<svg xmlns='http://www.w3.org/2000/svg' width='{width}' height='{height}'>"]
+    for n, (tool, depth) in enumerate(depths.items()):
+        if len(depth):
+            path = _step_path(depth, x_scale, y_scale, height / 2, -1 if _mirrored(n, len(depths)) else 1)
+            parts.append(f"<path d='{path}' fill='{colors[tool]}' fill-opacity='0.5'>"
+                         f"<title>{html.escape(tool)}</title></path>")
+    if window is not None:
+        x0, x1 = window[0] * width, window[1] * width
+        parts.append(f"<rect x='{x0:.1f}' y='0' width='{max(x1 - x0, 1):.1f}' height='{height}' "
+                     f"fill='none' stroke='black' stroke-width='1.5'/>")
+    parts.append(f"<line x1='0' y1='{height / 2}' x2='{width}' y2='{height / 2}' stroke='black' stroke-width='0.5'/></svg>")
+    return "".join(parts)
+
+
+def _figure_png(draw, figsize=(18, 2)):
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=figsize)
+    try:
+        draw(fig.subplots())
+        buf = io.BytesIO()
+        fig.savefig(buf, format="png", bbox_inches="tight")
+        return buf.getvalue()
+    finally:
+        fig.clear()
+
+
+@traced
+def bar_chart_png(labels, values, colors, xlabel, title, xmax=None, fmt="{:.2f}"):
+    def draw(ax):
+        bars = ax.barh(labels, values, color=colors)
+        for bar in bars:
+            width = bar.get_width()
+            ax.text(width + 1, bar.get_y() + bar.get_height() / 2, fmt.format(width), va='center')
+        ax.set_xlabel(xlabel)
+        ax.set_title(title)
+        if xmax is not None:
+            ax.set_xlim(0, xmax)
+
+    return _figure_png(draw)
+
+
+@traced
+def track_png(depths, colors, positions=None, length=None, window=None):
+    """Coverage track PNG; arguments as for :func:`track_data`, ``window=(start, stop)`` in residues is shaded."""
+    def draw(ax):
+        for n, (tool, depth) in enumerate(depths.items()):
+            x = np.arange(1, len(depth) + 1) if positions is None else np.asarray(positions) + 1
+            ax.fill_between(x, -depth if _mirrored(n, len(depths)) else depth, step="post" if positions is not None else "mid",
+                            color=colors[tool], alpha=0.5, label=tool)
+        ax.axhline(0, color="black", linewidth=0.5)
+        if window is not None:
+            ax.axvspan(window[0] + 1, window[1], color="grey", alpha=0.2)
+        ax.set_xlim(1, max(length or max((len(d) for d in depths.values()), default=1), 1))
+        ax.set_xlabel("Residue")
+        ax.set_ylabel("Depth")
+        ax.legend(loc="upper right")
+
+    return _figure_png(draw)
@@ -0,0 +1,129 @@
+"""Simplified-semi-tryptic classification of peptides.
+
+Each occurrence (site) of a peptide is classified on both termini against a
+per-sequence array of cleavage sites for the chosen protease rule:
+
+* the N-terminus is tryptic when the bond before the peptide is a cleavage
+  site (the protein N-terminus does not count);
+* the C-terminus is tryptic when the bond after its last residue is a
+  cleavage site.
+
+A site is simplified-semi-tryptic when exactly one terminus is tryptic. A
+peptide is classified on its most tryptic site, so a peptide that also occurs
+at a fully tryptic site is not counted as semi-tryptic.
+"""
+from collections import namedtuple
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from .instrument import traced
+
+SEMI_TRYPTIC = "simplified_semi_tryptic"
+NOT_SEMI_TRYPTIC = "no_simplified_semi_tryptic"
+
+ProteaseRule = namedtuple("ProteaseRule", ["name", "cleave_after", "not_before"])
+
+PROTEASES = {
+    # K/R regardless of the next residue: the rule the app has always used
+    "simplified-trypsin": ProteaseRule("simplified-trypsin", "KR", ""),
+    "trypsin": ProteaseRule("trypsin", "KR", "P"),
+    "lys-c": ProteaseRule("lys-c", "K", ""),
+    "glu-c": ProteaseRule("glu-c", "E", ""),
+}
+DEFAULT_PROTEASE = "simplified-trypsin"
+
+
+def get_protease(protease):
+    """:class:`ProteaseRule` for a rule or a name from :data:`PROTEASES`."""
+    if isinstance(protease, ProteaseRule):
+        return protease
+    try:
+        return PROTEASES[protease]
+    except KeyError:
+        raise ValueError(f"Unknown protease {protease!r}, expected one of {sorted(PROTEASES)}") from None
+
+
+def _residue_codes(sequence):
+    return np.frombuffer(sequence.encode("ascii", "replace"), dtype=np.uint8)
+
+
+@lru_cache(maxsize=None)
+def _residue_table(residues):
+    """256-entry lookup table, True at the byte values of ``residues``."""
+    table = np.zeros(256, dtype=bool)
+    table[_residue_codes(residues)] = True
+    return table
+
+
+@lru_cache(maxsize=1024)
+def cleavage_index(sequence, protease=DEFAULT_PROTEASE):
+    """Read-only boolean array, True at ``i`` when the bond after residue ``i`` is cleavable."""
+    rule = get_protease(protease)
+    residues = _residue_codes(sequence)
+    sites = _residue_table(rule.cleave_after)[residues]
+    if rule.not_before and len(sites):
+        sites[:-1] &= ~_residue_table(rule.not_before)[residues[1:]]
+    sites.flags.writeable = False
+    return sites
+
+
+def terminal_status(sequence, starts, ends, protease=DEFAULT_PROTEASE):
+    """Boolean ``(n_tryptic, c_tryptic)`` arrays for peptide sites ``[start, end)``."""
+    sites = cleavage_index(sequence, protease)
+    starts = np.asarray(starts, dtype=np.int64)
+    ends = np.asarray(ends, dtype=np.int64)
+    n_tryptic = np.zeros(len(starts), dtype=bool)
+    inner = starts > 0
+    n_tryptic[inner] = sites[starts[inner] - 1]
+    c_tryptic = sites[ends - 1] if len(ends) else np.zeros(0, dtype=bool)
+    return n_tryptic, c_tryptic
+
+
+@traced
+def classify_sites(sequence, hits, protease=DEFAULT_PROTEASE):
+    """One row per hit with its N-/C-terminal tryptic status and semi-tryptic flag."""
+    sites = pd.DataFrame(hits, columns=["peptide", "start", "end", "tool"])
+    n_tryptic, c_tryptic = terminal_status(sequence, sites["start"], sites["end"], protease)
+    sites["n_tryptic"] = n_tryptic
+    sites["c_tryptic"] = c_tryptic
+    sites["semi_tryptic"] = n_tryptic ^ c_tryptic
+    return sites.sort_values(["start", "end", "tool"], ignore_index=True)
+
+
+def best_site_scores(sequence, peptides, hits, tool, protease=DEFAULT_PROTEASE):
+    """Highest number of tryptic termini over the sites of each peptide (-1 if not found)."""
+    positions = {pep: i for i, pep in enumerate(peptides)}
+    pids, starts, ends = [], [], []
+    for hit in hits:
+        if hit.tool == tool and hit.peptide in positions:
+            pids.append(positions[hit.peptide])
+            starts.append(hit.start)
+            ends.append(hit.end)
+    best = np.full(len(peptides), -1, dtype=np.int8)
+    if pids:
+        n_tryptic, c_tryptic = terminal_status(sequence, starts, ends, protease)
+        np.maximum.at(best, np.asarray(pids), n_tryptic.astype(np.int8) + c_tryptic)
+    return best
+
+
+@traced
+def count_simplified_semi_tryptic(sequence, peptides, hits, tool, protease=DEFAULT_PROTEASE):
+    return int((best_site_scores(sequence, peptides, hits, tool, protease) == 1).sum())
+
+
+def classify_simplified_semi_tryptic(protein_sequence, peptide, protease=DEFAULT_PROTEASE):
+    """Classify a single peptide over all of its occurrences in ``protein_sequence``."""
+    if pd.isna(protein_sequence) or pd.isna(peptide) or not peptide:
+        return NOT_SEMI_TRYPTIC
+    starts = []
+    index = protein_sequence.find(peptide)
+    while index != -1:
+        starts.append(index)
+        index = protein_sequence.find(peptide, index + 1)
+    if not starts:
+        return NOT_SEMI_TRYPTIC
+    n_tryptic, c_tryptic = terminal_status(protein_sequence, starts, [s + len(peptide) for s in starts], protease)
+    best = (n_tryptic.astype(np.int8) + c_tryptic).max()
+    return SEMI_TRYPTIC if best == 1 else NOT_SEMI_TRYPTIC
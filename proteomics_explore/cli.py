@@ -0,0 +1,241 @@
+"""Command-line entry point: ``python -m proteomics_explore``.
+
+``analyze`` runs the same analysis as the Streamlit app without starting a UI
+server: tool CSVs are streamed in chunks and one summary row per protein is
+written to CSV or Parquet as results come in, optionally together with a
+table of residues covered by each exact combination of tools. ``compile``
+runs the same analysis once and stores the inputs and results as a dataset
+bundle that the app opens without re-uploading. ``synth`` writes synthetic
+input CSVs and ``bench`` times every analysis stage on them.
+Nothing here imports streamlit or matplotlib.
+"""
+import argparse
+import json
+import string
+import sys
+import time
+
+import pandas as pd
+
+from . import bench, ingest, instrument
+from .batch import CHUNK_SIZE, iter_summaries
+from .bundle import compile_bundle
+from .classify import DEFAULT_PROTEASE, PROTEASES
+from .overlap import OverlapCounts
+from .stream import CHUNK_ROWS, MEMORY_MB, build_index_streaming
+from .synthetic import write_dataset
+
+
+def _tool_letters(n):
+    """Letters of the ``n``-th tool (from 0): A, ..., Z, AA, AB, ..."""
+    letters = ""
+    n += 1
+    while n:
+        n, rest = divmod(n - 1, len(string.ascii_uppercase))
+        letters = string.ascii_uppercase[rest] + letters
+    return letters
+
+
+def parse_tool_args(values):
+    """``{tool: path}`` from ``NAME=PATH`` or bare ``PATH`` arguments (named TOOL-A, ..., TOOL-Z, TOOL-AA, ...)."""
+    tools = {}
+    for n, value in enumerate(values):
+        name, sep, path = value.partition("=")
+        if not sep:
+            name, path = f"TOOL-{_tool_letters(n)}", value
+        tools[name] = path
+    return tools
+
+
+class SummaryWriter:
+    """Write summary rows chunk by chunk to a ``.csv`` or ``.parquet`` file."""
+
+    def __init__(self, path):
+        self.path = path
+        self.parquet = path.endswith(".parquet")
+        self._writer = None
+        self._wrote_header = False
+        if self.parquet and ingest.pyarrow is None:
+            raise SystemExit("Writing Parquet output requires pyarrow")
+
+    def write(self, rows):
+        if not rows:
+            return
+        df = pd.DataFrame(rows)
+        if self.parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            # Later chunks take the column types of the first one, so a chunk of all-zero counts still fits
+            schema = self._writer.schema if self._writer is not None else None
+            table = pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self.path, table.schema)
+            self._writer.write_table(table)
+        else:
+            df.to_csv(self.path, mode="a" if self._wrote_header else "w",
+                      header=not self._wrote_header, index=False)
+            self._wrote_header = True
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+
+def _report_progress(done, total):
+    print(f"\ranalysed {done}/{total} proteins", end="", file=sys.stderr, flush=True)
+
+
+def analyze(args):
+    started = time.perf_counter()
+    recorder = instrument.Recorder().start() if args.trace else None
+    index = build_index_streaming(args.main, parse_tool_args(args.tools), chunk_rows=args.chunk_rows,
+                                  memory_mb=args.memory_mb, spill_dir=args.spill_dir)
+
+    overlap = OverlapCounts(index.tools) if args.overlap else None
+    writer = SummaryWriter(args.output)
+    try:
+        for rows in iter_summaries(index, workers=args.workers, chunk_size=args.chunk_size,
+                                   progress=None if args.quiet else _report_progress, protease=args.protease,
+                                   overlap=overlap):
+            writer.write(rows)
+    finally:
+        writer.close()
+    if overlap is not None:
+        overlap.frame().to_csv(args.overlap, index=False)
+    if recorder is not None:
+        recorder.stop()
+        with open(args.trace, "w") as f:
+            json.dump(recorder.chrome_trace(), f)
+    if not args.quiet:
+        elapsed = time.perf_counter() - started
+        print(f"\nwrote {len(index)} proteins to {args.output} in {elapsed:.1f}s", file=sys.stderr)
+    return 0
+
+
+def compile_dataset(args):
+    started = time.perf_counter()
+    index = build_index_streaming(args.main, parse_tool_args(args.tools), chunk_rows=args.chunk_rows,
+                                  memory_mb=args.memory_mb, spill_dir=args.spill_dir)
+    compile_bundle(index, args.output, protease=args.protease, workers=args.workers, chunk_size=args.chunk_size,
+                   progress=None if args.quiet else _report_progress)
+    if not args.quiet:
+        elapsed = time.perf_counter() - started
+        print(f"\ncompiled {len(index)} proteins into {args.output} in {elapsed:.1f}s", file=sys.stderr)
+    return 0
+
+
+def synth(args):
+    paths = write_dataset(args.directory, args.proteins, length=args.length, peptides=args.peptides,
+                          n_tools=args.tools, missed_cleavages=args.missed_cleavages,
+                          semi_fraction=args.semi_fraction, protease=args.protease, seed=args.seed)
+    if not args.quiet:
+        print("\n".join(paths.values()), file=sys.stderr)
+    return 0
+
+
+def _report_scale(scale):
+    print(f"benchmarking {scale.proteins} proteins, length {scale.length}, {scale.peptides} peptides",
+          file=sys.stderr, flush=True)
+
+
+def run_bench(args):
+    results = bench.run_benchmark(args.scale or bench.DEFAULT_SCALES, n_tools=args.tools,
+                                  missed_cleavages=args.missed_cleavages, semi_fraction=args.semi_fraction,
+                                  protease=args.protease, seed=args.seed, repeat=args.repeat,
+                                  memory=not args.no_memory, progress=None if args.quiet else _report_scale)
+    bench.save_results(results, args.output)
+    if not args.quiet:
+        columns = ["proteins", "length", "peptides", "stage", "seconds", "throughput", "unit", "peak_mb"]
+        print(bench.results_frame(results)[columns].to_string(index=False), file=sys.stderr)
+    if args.baseline is None:
+        return 0
+    comparison = bench.compare(bench.load_results(args.baseline), results, args.tolerance)
+    regressions = comparison[comparison["regression"]]
+    if not args.quiet:
+        print(comparison.to_string(index=False), file=sys.stderr)
+    if len(regressions):
+        print(f"{len(regressions)} stage(s) slower than the baseline by more than {args.tolerance:.0%}",
+              file=sys.stderr)
+        return 1
+    return 0
+
+
+def _scale(value):
+    try:
+        return bench.parse_scale(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e)) from None
+
+
+def _add_synthetic_args(p):
+    p.add_argument("--tools", type=int, default=2, help="number of tool tables")
+    p.add_argument("--missed-cleavages", type=int, default=1, help="maximum missed cleavages per peptide")
+    p.add_argument("--semi-fraction", type=float, default=0.1,
+                   help="fraction of peptides trimmed at one terminus")
+    p.add_argument("--protease", choices=sorted(PROTEASES), default=DEFAULT_PROTEASE,
+                   help="cleavage rule of the in-silico digestion and the classification")
+    p.add_argument("--seed", type=int, default=0, help="random seed")
+    p.add_argument("-q", "--quiet", action="store_true", help="no progress output")
+
+
+def _add_analysis_args(p):
+    p.add_argument("main", help="main CSV with ProteinName and Sequence columns")
+    p.add_argument("tools", nargs="+", metavar="[NAME=]TOOL_CSV",
+                   help="tool CSVs with ProteinName and a Peptides_* column (default names TOOL-A, TOOL-B, ...)")
+    p.add_argument("--protease", choices=sorted(PROTEASES), default=DEFAULT_PROTEASE,
+                   help="cleavage rule for the semi-tryptic classification")
+    p.add_argument("-j", "--workers", type=int, default=None, help="worker processes (default: all CPUs)")
+    p.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="proteins per work item")
+    p.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS, help="tool CSV rows read at a time")
+    p.add_argument("--memory-mb", type=int, default=MEMORY_MB,
+                   help="peptides buffered in memory before spilling to disk")
+    p.add_argument("--spill-dir", default=None, help="directory for spilled peptide partitions (default: temp dir)")
+    p.add_argument("-q", "--quiet", action="store_true", help="no progress output")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="proteomics_explore",
+                                     description="Peptide coverage and simplified-semi-tryptic analysis.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    p = commands.add_parser("analyze", help="write per-protein coverage and semi-tryptic counts")
+    _add_analysis_args(p)
+    p.add_argument("-o", "--output", required=True, help="output .csv or .parquet file")
+    p.add_argument("--overlap", default=None, metavar="CSV",
+                   help="also write residues and proteins covered by each exact combination of tools")
+    p.add_argument("--trace", default=None, metavar="JSON",
+                   help="write a Chrome trace of the run (per-protein spans only with -j 1)")
+    p.set_defaults(func=analyze)
+
+    p = commands.add_parser("compile", help="compile the inputs and their matches into a dataset bundle")
+    _add_analysis_args(p)
+    p.add_argument("-o", "--output", required=True, help="bundle directory")
+    p.set_defaults(func=compile_dataset)
+
+    p = commands.add_parser("synth", help="write a synthetic main CSV and tool CSVs")
+    p.add_argument("directory", help="output directory")
+    p.add_argument("--proteins", type=int, default=1000, help="number of proteins")
+    p.add_argument("--length", type=int, default=400, help="mean sequence length")
+    p.add_argument("--peptides", type=int, default=20, help="peptides per protein and tool (at most)")
+    _add_synthetic_args(p)
+    p.set_defaults(func=synth)
+
+    p = commands.add_parser("bench", help="time every analysis stage on synthetic data")
+    p.add_argument("-o", "--output", required=True, help="output .json file")
+    p.add_argument("--scale", type=_scale, action="append", metavar="PROTEINS:LENGTH:PEPTIDES",
+                   help="dataset size to benchmark, repeatable (default: "
+                        + ", ".join(":".join(map(str, scale)) for scale in bench.DEFAULT_SCALES) + ")")
+    p.add_argument("--repeat", type=int, default=1, help="runs per stage, the fastest is reported")
+    p.add_argument("--no-memory", action="store_true", help="skip the tracemalloc peak-memory run")
+    p.add_argument("--baseline", default=None, help="earlier results .json to compare against")
+    p.add_argument("--tolerance", type=float, default=bench.TOLERANCE,
+                   help="allowed slowdown over the baseline before failing (fraction)")
+    _add_synthetic_args(p)
+    p.set_defaults(func=run_bench)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
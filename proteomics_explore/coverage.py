@@ -0,0 +1,102 @@
+"""Per-residue coverage depth from peptide hits.
+
+Each tool's hits are turned into a depth vector with a difference array (+1 at
+every start, -1 at every end, then a cumulative sum), so coverage is computed
+in one O(L + hits) pass. Single-tool, union and intersection coverage are all
+derived from the same vectors, which can also be plotted directly as a
+coverage track or, for long proteins, downsampled to a fixed-size overview.
+For comparisons across many tools the covered residues are packed into one
+bitset per tool (see :mod:`proteomics_explore.overlap`).
+"""
+import numpy as np
+
+from .instrument import traced
+from .overlap import CoverageBits
+
+OVERVIEW_BINS = 600
+
+
+def depth_vectors(length, hits, tools):
+    """``{tool: np.int32 array}`` with the number of hits of ``tool`` covering each residue."""
+    intervals = {tool: ([], []) for tool in tools}
+    for hit in hits:
+        if hit.tool in intervals:
+            intervals[hit.tool][0].append(hit.start)
+            intervals[hit.tool][1].append(hit.end)
+    depths = {}
+    for tool, (starts, ends) in intervals.items():
+        if not starts:
+            depths[tool] = np.zeros(length, dtype=np.int32)
+            continue
+        diff = np.bincount(starts, minlength=length + 1) - np.bincount(ends, minlength=length + 1)
+        depths[tool] = np.cumsum(diff[:length], dtype=np.int32)
+    return depths
+
+
+class Coverage:
+    """Coverage of one protein sequence by the hits of several tools."""
+
+    def __init__(self, length, depths):
+        self.length = length
+        self.depths = depths
+
+    @classmethod
+    @traced
+    def from_hits(cls, length, hits, tools):
+        return cls(length, depth_vectors(length, hits, tools))
+
+    @property
+    def tools(self):
+        return list(self.depths)
+
+    @property
+    def nbytes(self):
+        return sum(depth.nbytes for depth in self.depths.values())
+
+    def covered(self, tool):
+        return self.depths[tool] > 0
+
+    def union(self, tools=None):
+        mask = np.zeros(self.length, dtype=bool)
+        for tool in tools or self.tools:
+            mask |= self.covered(tool)
+        return mask
+
+    def intersection(self, tools=None):
+        mask = np.ones(self.length, dtype=bool)
+        for tool in tools or self.tools:
+            mask &= self.covered(tool)
+        return mask
+
+    def _percent(self, mask):
+        return mask.sum() / self.length * 100 if self.length > 0 else 0.0
+
+    def percent(self, tool):
+        return self._percent(self.covered(tool))
+
+    def union_percent(self, tools=None):
+        return self._percent(self.union(tools))
+
+    def intersection_percent(self, tools=None):
+        return self._percent(self.intersection(tools))
+
+    def bits(self):
+        """Covered residues of every tool as packed bitsets."""
+        return CoverageBits.from_coverage(self)
+
+    def overview(self, bins):
+        """``(bin_starts, {tool: max depth per bin})`` over at most ``bins`` equal-width bins."""
+        edges = bin_edges(self.length, bins)
+        return edges[:-1], {tool: downsample(depth, edges) for tool, depth in self.depths.items()}
+
+
+def bin_edges(length, bins):
+    """Edges of at most ``bins`` contiguous, non-empty bins covering ``range(length)``."""
+    return np.unique(np.linspace(0, length, min(bins, length) + 1).astype(np.int64))
+
+
+def downsample(depth, edges):
+    """Maximum of ``depth`` within each ``[edges[i], edges[i + 1])`` bin."""
+    if len(edges) < 2:
+        return np.zeros(0, dtype=depth.dtype)
+    return np.maximum.reduceat(depth, edges[:-1])
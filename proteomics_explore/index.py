@@ -0,0 +1,130 @@
+"""Per-protein index of sequences and tool peptides.
+
+The main table holds one row per protein. Each tool table holds one row per
+(protein, peptide) pair. Rather than joining them (which multiplies the TOOL-A
+and TOOL-B peptide rows of every protein), the peptides of each tool are
+grouped by protein once into CSR-style offset arrays so that looking up the
+peptides of a protein is a slice.
+"""
+import numpy as np
+import pandas as pd
+
+from .ingest import upload_cache
+from .instrument import traced
+
+
+def peptide_column(df):
+    """Name of the ``Peptides_*`` column of a tool table."""
+    for col in df.columns:
+        if col.startswith("Peptides"):
+            return col
+    raise ValueError(f"No Peptides_* column among {list(df.columns)}")
+
+
+def protein_codes(names, df, column=None):
+    """Protein positions in ``names`` and peptides of the rows of a tool table.
+
+    Rows without a peptide, or whose protein is not in ``names``, are dropped.
+    """
+    column = column or peptide_column(df)
+    pairs = df[["ProteinName", column]].dropna()
+    codes = names.get_indexer(pairs["ProteinName"].astype(object))
+    keep = codes >= 0
+    return codes[keep], pairs[column].to_numpy(dtype=object)[keep]
+
+
+class PeptideGroups:
+    """Unique peptides of one tool grouped by protein position.
+
+    ``peptides[offsets[i]:offsets[i + 1]]`` are the peptides of protein ``i``,
+    in the order they first appear in the tool table.
+    """
+
+    def __init__(self, offsets, peptides):
+        self.offsets = offsets
+        self.peptides = peptides
+
+    @classmethod
+    def from_codes(cls, codes, peptides, n_proteins):
+        """Group ``peptides`` by their protein position ``codes``, dropping repeated pairs."""
+        pairs = pd.DataFrame({"code": codes, "peptide": peptides}).drop_duplicates()
+        codes = pairs["code"].to_numpy()
+        order = np.argsort(codes, kind="stable")
+        offsets = np.zeros(n_proteins + 1, dtype=np.int64)
+        np.cumsum(np.bincount(codes, minlength=n_proteins), out=offsets[1:])
+        return cls(offsets, pairs["peptide"].to_numpy(dtype=object)[order])
+
+    @classmethod
+    def from_frame(cls, names, df, column=None):
+        """Group ``df`` by protein, keeping only proteins present in ``names`` (a ``pd.Index``)."""
+        codes, peptides = protein_codes(names, df, column)
+        return cls.from_codes(codes, peptides, len(names))
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def get(self, i):
+        return self.peptides[self.offsets[i]:self.offsets[i + 1]]
+
+    def counts(self):
+        return np.diff(self.offsets)
+
+    @property
+    def nbytes(self):
+        return self.offsets.nbytes + sum(len(p) for p in self.peptides) + self.peptides.nbytes
+
+
+class ProteinIndex:
+    """Protein table plus per-tool peptide groups, built once per set of uploads."""
+
+    def __init__(self, names, sequences, groups):
+        self.names = names
+        self.sequences = sequences
+        self.groups = groups
+        self._positions = {name: i for i, name in enumerate(names)}
+
+    @classmethod
+    @traced
+    def build(cls, main_df, tool_frames):
+        """Build from the main table and a ``{tool: DataFrame}`` mapping of tool tables."""
+        main = main_df.dropna(subset=["ProteinName"]).drop_duplicates("ProteinName")
+        names = pd.Index(main["ProteinName"].astype(object))
+        sequences = main["Sequence"].astype(object).fillna("").to_numpy(dtype=object)
+        groups = {tool: PeptideGroups.from_frame(names, df) for tool, df in tool_frames.items()}
+        return cls(names.to_numpy(dtype=object), sequences, groups)
+
+    def __len__(self):
+        return len(self.names)
+
+    @property
+    def tools(self):
+        return list(self.groups)
+
+    def position(self, name):
+        return self._positions[name]
+
+    def sequence(self, name):
+        return self.sequences[self._positions[name]]
+
+    def peptides(self, tool, name):
+        return self.groups[tool].get(self._positions[name])
+
+    @property
+    def nbytes(self):
+        seq_bytes = sum(len(s) for s in self.sequences) + self.sequences.nbytes
+        return seq_bytes + self.names.nbytes + sum(g.nbytes for g in self.groups.values())
+
+
+def load_index(main, tools):
+    """Cached :meth:`ProteinIndex.build`.
+
+    ``main`` is a ``(content_hash, DataFrame)`` pair as returned by
+    :func:`proteomics_explore.ingest.read_upload` and ``tools`` maps each tool
+    name to such a pair.
+    """
+    key = ("index", main[0]) + tuple((tool, h) for tool, (h, _) in tools.items())
+    index = upload_cache().get(key)
+    if index is None:
+        index = ProteinIndex.build(main[1], {tool: df for tool, (_, df) in tools.items()})
+        upload_cache().put(key, index)
+    return index
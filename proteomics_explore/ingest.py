@@ -0,0 +1,143 @@
+"""Parse uploaded CSVs once per content hash.
+
+Every Streamlit rerun hands the script the same uploaded bytes again, so parsed
+frames are kept in an LRU cache keyed by a hash of the file contents. The hash
+of a Streamlit upload is itself remembered by the upload's ``file_id`` (new for
+every upload), so reruns do not hash hundreds of megabytes again. The indexes
+built from the frames live in the same cache, so ``PROTEOMICS_CACHE_MB`` bounds
+both together. When a cache directory is configured (and pyarrow is
+available) each parsed frame is also written as Parquet so a restarted server
+skips the CSV parse entirely.
+"""
+import hashlib
+import io
+import os
+
+import pandas as pd
+
+from .cache import LRUCache
+from .instrument import traced
+
+try:
+    import pyarrow  # noqa: F401
+except ImportError:
+    pyarrow = None
+
+CACHE_MAX_MB = int(os.environ.get("PROTEOMICS_CACHE_MB", "1024"))
+CACHE_DIR = os.environ.get("PROTEOMICS_CACHE_DIR") or None
+
+# Parsed frames and the indexes built from them share one budget
+_frames = LRUCache(CACHE_MAX_MB * 1024 * 1024)
+# Content hash by upload file_id; entries are tiny, so the budget is effectively a count
+_upload_hashes = LRUCache(4096, sizeof=lambda key: 1)
+
+
+def upload_cache():
+    """The in-process LRU cache, bounded by ``PROTEOMICS_CACHE_MB``, holding parsed frames and indexes."""
+    return _frames
+
+
+def set_cache_limit(max_mb):
+    """Change the in-process cache budget, evicting frames and indexes if needed."""
+    _frames.resize(max_mb * 1024 * 1024)
+
+
+def clear_cache():
+    _frames.clear()
+    _upload_hashes.clear()
+
+
+def content_hash(data):
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def source_hash(source):
+    """Content hash of an upload, an open file or a path; Streamlit uploads are hashed once per upload."""
+    file_id = getattr(source, "file_id", None)
+    if file_id is None:
+        return content_hash(read_bytes(source))
+    key = _upload_hashes.get(file_id)
+    if key is None:
+        key = _upload_hashes.put(file_id, content_hash(read_bytes(source)))
+    return key
+
+
+def column_dtypes(columns):
+    """Fixed dtypes for the columns the app knows about."""
+    dtypes = {}
+    for col in columns:
+        if col == "ProteinName":
+            dtypes[col] = "category"
+        elif col == "Sequence" or col.startswith("Peptides"):
+            dtypes[col] = "string"
+    return dtypes
+
+
+@traced
+def parse_csv(data):
+    header = pd.read_csv(io.BytesIO(data), nrows=0).columns
+    return pd.read_csv(io.BytesIO(data), dtype=column_dtypes(header))
+
+
+def read_head(source, n=5):
+    """First ``n`` rows of a CSV without parsing the rest of it."""
+    if isinstance(source, bytes) or hasattr(source, "getvalue"):
+        source = io.BytesIO(read_bytes(source))
+    return pd.read_csv(source, nrows=n)
+
+
+def read_bytes(source):
+    """Raw bytes of an upload, an open file or a path."""
+    if isinstance(source, bytes):
+        return source
+    if hasattr(source, "getvalue"):
+        return source.getvalue()
+    if hasattr(source, "read"):
+        return source.read()
+    with open(source, "rb") as f:
+        return f.read()
+
+
+def _parquet_path(cache_dir, key):
+    return os.path.join(cache_dir, f"{key}.parquet")
+
+
+def _load_disk_copy(cache_dir, key):
+    if cache_dir is None or pyarrow is None:
+        return None
+    path = _parquet_path(cache_dir, key)
+    if not os.path.exists(path):
+        return None
+    try:
+        return pd.read_parquet(path)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_disk_copy(cache_dir, key, df):
+    if cache_dir is None or pyarrow is None:
+        return
+    os.makedirs(cache_dir, exist_ok=True)
+    path = _parquet_path(cache_dir, key)
+    # Write to a temporary name first so a concurrent reader never sees a partial file
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    df.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+
+@traced
+def read_upload(source, cache_dir=CACHE_DIR):
+    """Return ``(content_hash, DataFrame)`` for an uploaded CSV, parsing it at most once."""
+    # Open files can be read only once, so anything that is not an upload is read up front
+    data = read_bytes(source) if getattr(source, "file_id", None) is None else None
+    key = content_hash(data) if data is not None else source_hash(source)
+    df = _frames.get(key)
+    if df is not None:
+        return key, df
+
+    df = _load_disk_copy(cache_dir, key)
+    if df is None:
+        df = parse_csv(data if data is not None else read_bytes(source))
+        _write_disk_copy(cache_dir, key, df)
+    _frames.put(key, df)
+    return key, df
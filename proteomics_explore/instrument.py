@@ -0,0 +1,261 @@
+"""Opt-in instrumentation: timed spans, call counts, allocations and a sampling profiler.
+
+Stages and per-protein functions are wrapped in :func:`span` (or decorated
+with :func:`traced`). While no :class:`Recorder` is active these return
+immediately after one empty-dict test, so instrumentation can stay in the code.
+A recorder is active for the thread that started it only, which keeps
+concurrent Streamlit sessions from recording into each other's traces; it can
+be stopped from any thread. With ``memory=True`` every span also records the
+net change in traced allocations (``tracemalloc``, shared by all recorders of
+the process) and top-level spans their peak allocation.
+
+Recorded spans can be summarised per name, exported as JSON, or exported in
+the Chrome trace event format for ``chrome://tracing`` or Perfetto.
+:class:`SamplingProfiler` samples the call stack of one thread from a
+background thread via ``sys._current_frames`` to show where a rerun spends
+its time below the instrumented level.
+"""
+import functools
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter, namedtuple
+from contextlib import nullcontext
+
+import pandas as pd
+
+Span = namedtuple("Span", ["name", "start", "seconds", "depth", "thread", "alloc_bytes", "peak_bytes", "args"])
+
+_NULL_SPAN = nullcontext()
+# Active recorder by thread id; checked first so disabled spans cost one dict test
+_recorders = {}
+_recorders_lock = threading.Lock()
+# tracemalloc is process-wide: it runs while any memory recorder needs it
+_tracemalloc_lock = threading.Lock()
+_tracemalloc_users = 0
+_tracemalloc_owned = False
+
+
+def _acquire_tracemalloc():
+    global _tracemalloc_users, _tracemalloc_owned
+    with _tracemalloc_lock:
+        if _tracemalloc_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _tracemalloc_owned = True
+        _tracemalloc_users += 1
+
+
+def _release_tracemalloc():
+    global _tracemalloc_users, _tracemalloc_owned
+    with _tracemalloc_lock:
+        _tracemalloc_users -= 1
+        # Tracing started outside this module is left running
+        if _tracemalloc_users == 0 and _tracemalloc_owned:
+            tracemalloc.stop()
+            _tracemalloc_owned = False
+
+
+class Recorder:
+    """Spans recorded on one thread between :meth:`start` and :meth:`stop`."""
+
+    def __init__(self, memory=False):
+        self.memory = memory
+        self.spans = []
+        self.origin = None
+        self._depth = 0
+        self._thread = None
+        self._tracing = False
+
+    def start(self):
+        self.origin = time.perf_counter()
+        self._thread = threading.get_ident()
+        if self.memory and not self._tracing:
+            _acquire_tracemalloc()
+            self._tracing = True
+        with _recorders_lock:
+            _recorders[self._thread] = self
+        return self
+
+    def stop(self):
+        # May run on another thread (e.g. the next Streamlit rerun); a newer recorder of the thread stays active
+        with _recorders_lock:
+            if _recorders.get(self._thread) is self:
+                del _recorders[self._thread]
+        if self._tracing:
+            _release_tracemalloc()
+            self._tracing = False
+        return self
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def stats_frame(self):
+        """Calls, total, mean and maximum time and net allocations per span name."""
+        columns = ["Name", "Calls", "Total (ms)", "Mean (ms)", "Max (ms)", "Net Alloc (MB)", "Peak (MB)"]
+        if not self.spans:
+            return pd.DataFrame(columns=columns)
+        df = pd.DataFrame(self.spans, columns=Span._fields)
+        df["alloc_bytes"] = pd.to_numeric(df["alloc_bytes"])
+        df["peak_bytes"] = pd.to_numeric(df["peak_bytes"])
+        stats = df.groupby("name", sort=False).agg(
+            calls=("seconds", "size"), total=("seconds", "sum"), mean=("seconds", "mean"),
+            longest=("seconds", "max"), alloc=("alloc_bytes", "sum"), peak=("peak_bytes", "max"))
+        stats = stats.sort_values("total", ascending=False).reset_index()
+        return pd.DataFrame({
+            "Name": stats["name"], "Calls": stats["calls"],
+            "Total (ms)": stats["total"] * 1000, "Mean (ms)": stats["mean"] * 1000, "Max (ms)": stats["longest"] * 1000,
+            "Net Alloc (MB)": stats["alloc"] / 2 ** 20 if self.memory else None,
+            "Peak (MB)": stats["peak"] / 2 ** 20 if self.memory else None,
+        })
+
+    def to_dict(self):
+        """Every span plus the per-name statistics, JSON-serialisable."""
+        return {
+            "memory": self.memory,
+            "spans": [dict(span._asdict(), args={k: repr(v) for k, v in span.args.items()}) for span in self.spans],
+            "stats": self.stats_frame().astype(object).where(lambda df: df.notna(), None).to_dict("records"),
+        }
+
+    def chrome_trace(self):
+        """Spans as Chrome trace "complete" events (timestamps in microseconds)."""
+        pid = os.getpid()
+        events = []
+        for span in self.spans:
+            args = {k: repr(v) for k, v in span.args.items()}
+            if span.alloc_bytes is not None:
+                args["alloc_bytes"] = span.alloc_bytes
+            events.append({"name": span.name, "ph": "X", "ts": span.start * 1e6, "dur": span.seconds * 1e6,
+                           "pid": pid, "tid": span.thread, "args": args})
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+class _ActiveSpan:
+    __slots__ = ("recorder", "name", "args", "started", "allocated")
+
+    def __init__(self, recorder, name, args):
+        self.recorder = recorder
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        recorder = self.recorder
+        if recorder.memory:
+            if recorder._depth == 0:
+                tracemalloc.reset_peak()
+            self.allocated = tracemalloc.get_traced_memory()[0]
+        recorder._depth += 1
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        seconds = time.perf_counter() - self.started
+        recorder = self.recorder
+        recorder._depth -= 1
+        alloc = peak = None
+        if recorder.memory:
+            current, traced_peak = tracemalloc.get_traced_memory()
+            alloc = current - self.allocated
+            if recorder._depth == 0:
+                peak = traced_peak - self.allocated
+        recorder.spans.append(Span(self.name, self.started - recorder.origin, seconds, recorder._depth,
+                                   recorder._thread, alloc, peak, self.args))
+
+
+def span(name, **args):
+    """Context manager timing the enclosed block as ``name`` while a recorder is active."""
+    if not _recorders:
+        return _NULL_SPAN
+    recorder = _recorders.get(threading.get_ident())
+    if recorder is None:
+        return _NULL_SPAN
+    return _ActiveSpan(recorder, name, args)
+
+
+def traced(func=None, name=None):
+    """Decorator recording every call of ``func`` as a span (named after the function by default)."""
+    if func is None:
+        return functools.partial(traced, name=name)
+    name = name or func.__qualname__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not _recorders:
+            return func(*args, **kwargs)
+        with span(name):
+            return func(*args, **kwargs)
+
+    return wrapper
+
+
+class SamplingProfiler:
+    """Sample the call stack of one thread every ``interval`` seconds from a background thread.
+
+    Samples are counted per stack, so :meth:`top` gives the functions seen
+    most often (inclusive and on top of the stack) and :meth:`collapsed` the
+    folded-stack text read by flame graph tools.
+    """
+
+    def __init__(self, interval=0.005, thread_id=None):
+        self.interval = interval
+        self.thread_id = thread_id
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._sampler = None
+
+    def start(self):
+        self.thread_id = self.thread_id or threading.get_ident()
+        self._stop.clear()
+        self._sampler = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._sampler.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._sampler is not None:
+            self._sampler.join()
+            self._sampler = None
+        return self
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            self.stacks[tuple(reversed(stack))] += 1
+            self.samples += 1
+
+    def top(self, n=25):
+        """The ``n`` functions most often on top of the stack, with their own and inclusive share of all samples."""
+        inclusive, own = Counter(), Counter()
+        for stack, count in self.stacks.items():
+            for function in set(stack):
+                inclusive[function] += count
+            own[stack[-1]] += count
+        functions = sorted(inclusive, key=lambda function: (-own[function], -inclusive[function]))[:n]
+        total = max(self.samples, 1)
+        return pd.DataFrame({
+            "Function": functions,
+            "Own (%)": [own[function] / total * 100 for function in functions],
+            "Inclusive (%)": [inclusive[function] / total * 100 for function in functions],
+        })
+
+    def collapsed(self):
+        """One ``frame;frame;frame count`` line per distinct stack."""
+        return "\n".join(f"{';'.join(stack)} {count}" for stack, count in self.stacks.most_common())
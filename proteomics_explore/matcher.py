@@ -0,0 +1,131 @@
+"""Multi-pattern peptide matching.
+
+All peptides of a protein (from every tool) are compiled into one Aho-Corasick
+automaton, so a single pass over the sequence finds every occurrence of every
+peptide. Small peptide sets fall back to one ``str.find`` scan per peptide,
+which is faster than the automaton below a few dozen peptides. Coverage,
+classification and highlighting all work from the resulting hits instead of
+searching the sequence themselves.
+"""
+from collections import namedtuple
+
+from .cache import LRUCache
+
+Hit = namedtuple("Hit", ["peptide", "start", "end", "tool"])
+
+# Below this many distinct peptides a str.find loop per peptide (which scans at
+# C speed) beats walking the automaton character by character in Python
+AUTOMATON_MIN_PATTERNS = 64
+
+
+class PeptideMatcher:
+    """Aho-Corasick automaton over the peptides of one or more tools."""
+
+    def __init__(self, peptides_by_tool):
+        patterns = {}
+        for tool, peptides in peptides_by_tool.items():
+            for pep in peptides:
+                if isinstance(pep, str) and pep:
+                    tools = patterns.setdefault(pep, [])
+                    if tool not in tools:
+                        tools.append(tool)
+        self.patterns = list(patterns)
+        self._tools = [tuple(patterns[pep]) for pep in self.patterns]
+        self._delta = None
+        if len(self.patterns) >= AUTOMATON_MIN_PATTERNS:
+            self._build()
+
+    def _build(self):
+        goto = [{}]
+        out = [[]]
+        for pid, pep in enumerate(self.patterns):
+            state = 0
+            for ch in pep:
+                nxt = goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[state][ch] = nxt
+                    goto.append({})
+                    out.append([])
+                state = nxt
+            out[state].append(pid)
+
+        # Breadth-first pass computing failure links. Transitions that fall back
+        # along failure links are resolved lazily and memoized in ``_delta``, so
+        # building stays linear in the total peptide length
+        self._fail = fail = [0] * len(goto)
+        self._delta = [dict(edges) for edges in goto]
+        queue = list(goto[0].values())
+        for state in queue:
+            for ch, nxt in goto[state].items():
+                fail[nxt] = self._transition(fail[state], ch) if state else 0
+                out[nxt] = out[nxt] + out[fail[nxt]]
+                queue.append(nxt)
+        self._out = out
+
+    def _transition(self, state, ch):
+        delta = self._delta[state]
+        nxt = delta.get(ch)
+        if nxt is None:
+            nxt = self._transition(self._fail[state], ch) if state else 0
+            delta[ch] = nxt
+        return nxt
+
+    def __len__(self):
+        return len(self.patterns)
+
+    @property
+    def nbytes(self):
+        # Rough footprint of the transition dicts; used only for cache accounting
+        if self._delta is None:
+            return 100 * len(self.patterns) + sum(len(pep) for pep in self.patterns)
+        return 100 * sum(len(d) for d in self._delta) + 50 * len(self._out)
+
+    def find(self, sequence):
+        """All occurrences of all peptides as ``Hit`` tuples, in no particular order.
+
+        A peptide reported by several tools yields one hit per tool.
+        """
+        hits = []
+        if not self.patterns or not isinstance(sequence, str):
+            return hits
+        if self._delta is None:
+            return self._find_each(sequence)
+        delta = self._delta
+        transition = self._transition
+        out = self._out
+        patterns = self.patterns
+        tools = self._tools
+        state = 0
+        for pos, ch in enumerate(sequence):
+            nxt = delta[state].get(ch)
+            state = nxt if nxt is not None else transition(state, ch)
+            if out[state]:
+                end = pos + 1
+                for pid in out[state]:
+                    pep = patterns[pid]
+                    for tool in tools[pid]:
+                        hits.append(Hit(pep, end - len(pep), end, tool))
+        return hits
+
+    def _find_each(self, sequence):
+        hits = []
+        for pep, tools in zip(self.patterns, self._tools):
+            start = sequence.find(pep)
+            while start != -1:
+                for tool in tools:
+                    hits.append(Hit(pep, start, start + len(pep), tool))
+                start = sequence.find(pep, start + 1)
+        return hits
+
+
+_matchers = LRUCache(256 * 1024 * 1024)
+
+
+def get_matcher(peptides_by_tool):
+    """Cached :class:`PeptideMatcher` for a ``{tool: peptides}`` mapping."""
+    key = tuple((tool, tuple(peptides)) for tool, peptides in peptides_by_tool.items())
+    matcher = _matchers.get(key)
+    if matcher is None:
+        matcher = _matchers.put(key, PeptideMatcher(peptides_by_tool))
+    return matcher
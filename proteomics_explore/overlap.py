@@ -0,0 +1,150 @@
+"""Packed per-tool coverage bitsets and UpSet-style overlap counts.
+
+The coverage of each tool is stored as one bit per residue (``np.packbits``),
+so a protein covered by ``n`` tools takes ``n * L / 8`` bytes. Union,
+intersection and unique-to-tool residues are bitwise operations on the
+packed rows, and the exact overlap of every tool combination (the bars of an
+UpSet plot) comes from one membership code per residue, so no pairwise
+comparison of tools is ever needed. Coverage percentages are sums over these
+overlap counts.
+"""
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+from .instrument import traced
+
+
+def combination_label(tools, code):
+    """``"TOOL-A & TOOL-C"`` for the membership ``code`` (bit ``i`` set for ``tools[i]``)."""
+    return " & ".join(tool for i, tool in enumerate(tools) if code >> i & 1)
+
+
+class CoverageBits:
+    """Residue coverage of one protein as one packed bit row per tool.
+
+    ``bits[i]`` holds ``np.packbits`` of the covered residues of ``tools[i]``;
+    the padding bits of the last byte are always zero.
+    """
+
+    def __init__(self, length, tools, bits):
+        self.length = length
+        self.tools = list(tools)
+        self.bits = bits
+        self._rows = {tool: i for i, tool in enumerate(self.tools)}
+        self._overlap = None
+
+    @classmethod
+    @traced
+    def from_coverage(cls, coverage):
+        """Pack a :class:`proteomics_explore.coverage.Coverage`."""
+        tools = coverage.tools
+        bits = np.zeros((len(tools), (coverage.length + 7) // 8), dtype=np.uint8)
+        for i, tool in enumerate(tools):
+            bits[i] = np.packbits(coverage.covered(tool))
+        return cls(coverage.length, tools, bits)
+
+    @property
+    def nbytes(self):
+        return self.bits.nbytes
+
+    def row(self, tool):
+        return self.bits[self._rows[tool]]
+
+    def covered(self, tool):
+        """Boolean mask of the residues covered by ``tool``."""
+        return np.unpackbits(self.row(tool), count=self.length).astype(bool)
+
+    def union(self, tools=None):
+        """Packed residues covered by any of ``tools`` (default: all)."""
+        rows = [self._rows[tool] for tool in tools or self.tools]
+        return np.bitwise_or.reduce(self.bits[rows], axis=0) if rows else np.zeros(self.bits.shape[1], np.uint8)
+
+    def intersection(self, tools=None):
+        """Packed residues covered by every one of ``tools`` (default: all)."""
+        rows = [self._rows[tool] for tool in tools or self.tools]
+        return np.bitwise_and.reduce(self.bits[rows], axis=0) if rows else np.zeros(self.bits.shape[1], np.uint8)
+
+    def unique(self, tool):
+        """Packed residues covered by ``tool`` and by no other tool."""
+        others = [other for other in self.tools if other != tool]
+        return self.row(tool) & ~self.union(others) if others else self.row(tool)
+
+    def _mask(self, tools):
+        return sum(1 << self._rows[tool] for tool in tools or self.tools)
+
+    def _percent(self, residues):
+        return residues / self.length * 100 if self.length > 0 else 0.0
+
+    # Percentages are read off the overlap counts, which are built in one pass for all tools
+    def percent(self, tool):
+        return self.union_percent([tool])
+
+    def union_percent(self, tools=None):
+        mask = self._mask(tools)
+        return self._percent(sum(n for code, n in self.overlap_counts().items() if code & mask))
+
+    def intersection_percent(self, tools=None):
+        mask = self._mask(tools)
+        return self._percent(sum(n for code, n in self.overlap_counts().items() if code & mask == mask))
+
+    def unique_percent(self, tool):
+        return self._percent(self.overlap_counts().get(1 << self._rows[tool], 0))
+
+    @traced
+    def membership(self):
+        """Per-residue membership code: bit ``i`` is set when ``tools[i]`` covers the residue."""
+        # Re-packing the unpacked rows across tools gives the codes of up to 8 tools per byte
+        residues = np.unpackbits(self.bits, axis=1, count=self.length)
+        packed = np.packbits(residues, axis=0, bitorder="little")
+        codes = np.zeros(self.length, dtype=np.int64)
+        for n, byte in enumerate(packed):
+            codes |= byte.astype(np.int64) << 8 * n
+        return codes
+
+    def overlap_counts(self):
+        """``{membership code: residues}`` for every tool combination that covers at least one residue."""
+        if self._overlap is None:
+            codes = self.membership()
+            if len(self.tools) <= 16:
+                counts = np.bincount(codes, minlength=1)
+                codes = np.flatnonzero(counts)
+                counts = counts[codes]
+            else:
+                codes, counts = np.unique(codes, return_counts=True)
+            self._overlap = {code: n for code, n in zip(codes.tolist(), counts.tolist()) if code}
+        return self._overlap
+
+
+class OverlapCounts:
+    """UpSet-style overlap counts accumulated over many proteins.
+
+    For every exact combination of tools, the number of residues covered by
+    those tools and no others, and the number of proteins with at least one
+    such residue.
+    """
+
+    def __init__(self, tools):
+        self.tools = list(tools)
+        self.residues = Counter()
+        self.proteins = Counter()
+
+    def add(self, counts):
+        """Add the ``{code: residues}`` counts of one protein (see :meth:`CoverageBits.overlap_counts`)."""
+        self.residues.update(counts)
+        self.proteins.update(counts.keys())
+
+    def merge(self, other):
+        self.residues.update(other.residues)
+        self.proteins.update(other.proteins)
+
+    def frame(self):
+        """One row per tool combination, largest overlap first."""
+        codes = sorted(self.residues, key=lambda code: (-self.residues[code], code))
+        return pd.DataFrame({
+            "Tools": [combination_label(self.tools, code) for code in codes],
+            "Tool Count": [bin(code).count("1") for code in codes],
+            "Residues": [self.residues[code] for code in codes],
+            "Proteins": [self.proteins[code] for code in codes],
+        })
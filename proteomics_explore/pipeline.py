@@ -0,0 +1,62 @@
+"""Staged per-rerun pipeline with memoized stages and timings.
+
+The app's work is split into explicit stages (ingest, index, match, coverage,
+classify, render, charts). Each stage result is memoized in the shared result
+cache on the inputs that stage actually depends on, so a UI change only
+recomputes the stages whose inputs changed; toggling a highlight, for
+example, reruns the render stage alone. Every stage call is timed so this can
+be checked from the app. While an instrumentation recorder is active (see
+:mod:`proteomics_explore.instrument`) every stage is also recorded as a span.
+"""
+import time
+from collections import namedtuple
+
+import pandas as pd
+
+from .cache import shared_results
+from .instrument import span
+
+StageTiming = namedtuple("StageTiming", ["stage", "seconds", "cached"])
+
+
+class Pipeline:
+    """Run named stages for one rerun and record how long each took."""
+
+    def __init__(self, cache=None):
+        self.cache = cache if cache is not None else shared_results()
+        self.timings = []
+
+    def run(self, stage, key, compute):
+        """Result of ``compute()``, memoized on ``(stage,) + key``.
+
+        ``key=None`` means the stage memoizes itself (as ingestion and the
+        index do); the call is then only timed.
+        """
+        computed = False
+
+        def tracked():
+            nonlocal computed
+            computed = True
+            return compute()
+
+        started = time.perf_counter()
+        try:
+            with span(stage):
+                if key is None:
+                    return compute()
+                return self.cache.get_or_compute((stage,) + tuple(key), tracked)
+        finally:
+            cached = None if key is None else not computed
+            self.timings.append(StageTiming(stage, time.perf_counter() - started, cached))
+
+    @property
+    def total_seconds(self):
+        return sum(timing.seconds for timing in self.timings)
+
+    def timings_frame(self):
+        """One row per stage call with its duration in milliseconds and whether it was served from cache."""
+        return pd.DataFrame({
+            "Stage": [timing.stage for timing in self.timings],
+            "Time (ms)": [timing.seconds * 1000 for timing in self.timings],
+            "Cached": [timing.cached for timing in self.timings],
+        })
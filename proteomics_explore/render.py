@@ -0,0 +1,99 @@
+"""HTML rendering of a protein sequence with peptide and cleavage-site highlighting.
+
+Each residue gets a small bit set of style flags (one bit per highlighted
+tool, plus one for cleavage residues of the protease rule), taken from the
+coverage depth vectors and the cleavage-site index. Every tool is drawn with
+its own style slot (background, text colour, borders, ...) so that several
+tools can be highlighted at once. Runs of residues with identical flags are
+emitted as a single span, so the HTML is built once in O(L + hits) and its
+size grows with the number of style changes rather than with the number of
+peptides.
+"""
+import html
+
+import numpy as np
+
+from .classify import DEFAULT_PROTEASE, cleavage_index
+from .instrument import traced
+
+# Style of each tool slot; slot i is flag 1 << i. Each slot uses its own CSS
+# properties so that any combination of slots can be applied to one residue.
+TOOL_STYLES = (
+    "background-color:red;",
+    "color:blue; font-weight:bold;",
+    "border-bottom:2px solid darkorange;",
+    "border-top:2px solid purple;",
+    "font-style:italic;",
+    "text-decoration:underline wavy teal;",
+)
+
+# Proteins longer than this open in the windowed viewer by default
+WINDOW_THRESHOLD = 5000
+WINDOW_SIZE = 1000
+CLEAVAGE_FLAG = 1 << len(TOOL_STYLES)
+_CLEAVAGE_STYLE = "color:green; font-weight:bold;"
+
+
+def _combined_style(flags):
+    style = ""
+    for slot, slot_style in enumerate(TOOL_STYLES):
+        # Cleavage residues keep their green even inside a peptide of the second tool
+        if flags & (1 << slot) and not (slot == 1 and flags & CLEAVAGE_FLAG):
+            style += slot_style
+    if flags & CLEAVAGE_FLAG:
+        style += _CLEAVAGE_STYLE
+    return style
+
+
+def stylesheet(n_slots=2):
+    """``<style>`` block with one CSS class per flag combination of the first ``n_slots`` tool slots."""
+    n_slots = min(n_slots, len(TOOL_STYLES))
+    combinations = [tools | cleavage for cleavage in (0, CLEAVAGE_FLAG) for tools in range(1 << n_slots)]
+    return "<style>" + "".join(
+        f".pe{flags}{{{_combined_style(flags)}}}" for flags in combinations if flags
+    ) + "</style>"
+
+
+def tool_slots(tools):
+    """``{tool: slot}`` for tools in upload order; tools beyond the available styles get none."""
+    return {tool: slot for slot, tool in enumerate(tools) if slot < len(TOOL_STYLES)}
+
+
+def residue_flags(sequence, depths, protease=DEFAULT_PROTEASE, start=0, stop=None, slots=None):
+    """Style flags of residues ``start:stop`` for the ``{tool: depth vector}`` coverage and the protease cleavage sites.
+
+    ``slots`` maps each tool to its style slot (default: the order of ``depths``).
+    """
+    stop = len(sequence) if stop is None else stop
+    slots = tool_slots(depths) if slots is None else slots
+    flags = np.zeros(max(stop - start, 0), dtype=np.uint8)
+    for tool, depth in depths.items():
+        if tool in slots:
+            flags[depth[start:stop] > 0] |= 1 << slots[tool]
+    if protease is not None and sequence:
+        flags[cleavage_index(sequence, protease)[start:stop]] |= CLEAVAGE_FLAG
+    return flags
+
+
+@traced
+def render_sequence_html(sequence, depths, protease=DEFAULT_PROTEASE, start=0, stop=None, slots=None):
+    """Sequence (or its ``start:stop`` window) as HTML spans using the classes defined by :func:`stylesheet`.
+
+    ``depths`` maps each tool to highlight to its coverage depth vector (see
+    :func:`proteomics_explore.coverage.depth_vectors`) and ``slots`` maps
+    tools to style slots (see :func:`tool_slots`). Residues after which
+    ``protease`` cleaves are marked; ``protease=None`` leaves them unmarked.
+    Only the window is processed, so rendering cost follows the window size.
+    """
+    stop = len(sequence) if stop is None else min(stop, len(sequence))
+    if start >= stop:
+        return ""
+    flags = residue_flags(sequence, depths, protease, start, stop, slots)
+    bounds = np.flatnonzero(flags[1:] != flags[:-1]) + 1
+    starts = np.concatenate(([0], bounds)).tolist()
+    ends = np.concatenate((bounds, [len(flags)])).tolist()
+    parts = []
+    for seg_start, seg_end, flag in zip(starts, ends, flags[starts].tolist()):
+        text = html.escape(sequence[start + seg_start:start + seg_end])
+        parts.append(f"<span class=pe{flag}>{text}</span>" if flag else text)
+    return "".join(parts)
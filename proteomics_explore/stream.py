@@ -0,0 +1,191 @@
+"""Chunked ingestion of peptide tables that do not fit in memory.
+
+Peptide CSVs are read ``chunk_rows`` rows at a time and each row is mapped to
+its protein position in the main table. Mapped rows are buffered in memory
+until the buffer exceeds ``memory_mb``; from then on they are spilled to
+partition files on disk, one partition per contiguous range of proteins, and
+read back one partition at a time when peptides are looked up. Peak memory is
+therefore bounded by the chunk size and the buffer limit, not by the size of
+the file.
+"""
+import io
+import os
+import shutil
+import tempfile
+import threading
+import weakref
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from . import ingest
+from .ingest import upload_cache
+from .index import PeptideGroups, ProteinIndex, peptide_column, protein_codes
+from .instrument import traced
+
+CHUNK_ROWS = 500_000
+MEMORY_MB = 512
+N_PARTITIONS = 64
+CACHED_PARTITIONS = 4
+
+
+class SpilledPeptideGroups:
+    """Peptide groups stored in on-disk partitions, with the same lookup interface as :class:`PeptideGroups`."""
+
+    def __init__(self, directory, n_proteins, n_partitions, cached_partitions=CACHED_PARTITIONS):
+        self.directory = directory
+        self.n_proteins = n_proteins
+        self.n_partitions = n_partitions
+        self.cached_partitions = cached_partitions
+        self._loaded = OrderedDict()
+        self._counts = None
+        # The index is shared by every session of the process, so partition loads are serialised
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return self.n_proteins
+
+    def partition(self, i):
+        return i * self.n_partitions // max(self.n_proteins, 1)
+
+    def partition_range(self, part):
+        """First and one-past-last protein position stored in partition ``part``."""
+        first = -(-part * self.n_proteins // self.n_partitions)
+        last = -(-(part + 1) * self.n_proteins // self.n_partitions)
+        return first, last
+
+    def _path(self, part):
+        return os.path.join(self.directory, f"part-{part:04d}.csv")
+
+    def _load(self, part):
+        with self._lock:
+            return self._load_locked(part)
+
+    def _load_locked(self, part):
+        groups = self._loaded.get(part)
+        if groups is not None:
+            self._loaded.move_to_end(part)
+            return groups
+        first, last = self.partition_range(part)
+        path = self._path(part)
+        if os.path.exists(path):
+            rows = pd.read_csv(path, names=["code", "peptide"], dtype={"code": np.int64, "peptide": object},
+                               keep_default_na=False)
+            groups = PeptideGroups.from_codes(rows["code"].to_numpy() - first, rows["peptide"].to_numpy(), last - first)
+        else:
+            groups = PeptideGroups(np.zeros(last - first + 1, dtype=np.int64), np.empty(0, dtype=object))
+        self._loaded[part] = groups
+        while len(self._loaded) > self.cached_partitions:
+            self._loaded.popitem(last=False)
+        return groups
+
+    def get(self, i):
+        part = self.partition(i)
+        return self._load(part).get(i - self.partition_range(part)[0])
+
+    def counts(self):
+        with self._lock:
+            if self._counts is None:
+                self._counts = np.concatenate([self._load(part).counts() for part in range(self.n_partitions)])
+            return self._counts
+
+    @property
+    def nbytes(self):
+        with self._lock:
+            return sum(groups.nbytes for groups in self._loaded.values())
+
+
+class PeptideSpiller:
+    """Accumulate ``(protein position, peptide)`` rows, spilling to partition files past a memory limit."""
+
+    def __init__(self, n_proteins, memory_mb=MEMORY_MB, spill_dir=None, n_partitions=N_PARTITIONS):
+        self.n_proteins = n_proteins
+        self.memory_bytes = memory_mb * 1024 * 1024
+        self.spill_dir = spill_dir
+        self.n_partitions = max(1, min(n_partitions, n_proteins))
+        self.directory = None
+        self._codes = []
+        self._peptides = []
+        self._buffered = 0
+
+    def add(self, codes, peptides):
+        # Repeated pairs within a chunk are dropped right away to keep the buffer small
+        pairs = pd.DataFrame({"code": codes, "peptide": peptides}).drop_duplicates()
+        self._codes.append(pairs["code"].to_numpy())
+        self._peptides.append(pairs["peptide"].to_numpy(dtype=object))
+        self._buffered += int(pairs.memory_usage(deep=True).sum())
+        if self._buffered > self.memory_bytes:
+            self.spill()
+
+    def spill(self):
+        if not self._codes:
+            return
+        if self.directory is None:
+            self.directory = tempfile.mkdtemp(prefix="proteomics-spill-", dir=self.spill_dir)
+        codes = np.concatenate(self._codes)
+        peptides = np.concatenate(self._peptides)
+        parts = codes * self.n_partitions // self.n_proteins
+        order = np.argsort(parts, kind="stable")
+        bounds = np.searchsorted(parts[order], np.arange(self.n_partitions + 1))
+        for part in range(self.n_partitions):
+            rows = order[bounds[part]:bounds[part + 1]]
+            if len(rows):
+                pd.DataFrame({"code": codes[rows], "peptide": peptides[rows]}).to_csv(
+                    os.path.join(self.directory, f"part-{part:04d}.csv"), mode="a", header=False, index=False)
+        self._codes, self._peptides, self._buffered = [], [], 0
+
+    def finish(self):
+        """:class:`PeptideGroups` if everything fit in memory, otherwise :class:`SpilledPeptideGroups`."""
+        if self.directory is None:
+            codes = np.concatenate(self._codes) if self._codes else np.empty(0, dtype=np.int64)
+            peptides = np.concatenate(self._peptides) if self._peptides else np.empty(0, dtype=object)
+            self._codes, self._peptides, self._buffered = [], [], 0
+            return PeptideGroups.from_codes(codes, peptides, self.n_proteins)
+        self.spill()
+        groups = SpilledPeptideGroups(self.directory, self.n_proteins, self.n_partitions)
+        weakref.finalize(groups, shutil.rmtree, self.directory, True)
+        return groups
+
+
+def read_peptide_groups(source, names, chunk_rows=CHUNK_ROWS, memory_mb=MEMORY_MB, spill_dir=None):
+    """Group a tool CSV by the proteins in ``names`` (a ``pd.Index``), reading it in chunks."""
+    if isinstance(source, bytes) or hasattr(source, "getvalue"):
+        source = io.BytesIO(ingest.read_bytes(source))
+    spiller = PeptideSpiller(len(names), memory_mb, spill_dir)
+    column = None
+    for chunk in pd.read_csv(source, chunksize=chunk_rows, dtype=str):
+        column = column or peptide_column(chunk)
+        spiller.add(*protein_codes(names, chunk, column))
+    return spiller.finish()
+
+
+@traced
+def build_index_streaming(main_source, tool_sources, chunk_rows=CHUNK_ROWS, memory_mb=MEMORY_MB, spill_dir=None):
+    """:class:`ProteinIndex` whose peptide groups were read chunk by chunk.
+
+    The main table is parsed through :mod:`proteomics_explore.ingest`; each
+    entry of ``tool_sources`` (``{tool: path, bytes or upload}``) is streamed.
+    """
+    _, main_df = ingest.read_upload(main_source)
+    main = main_df.dropna(subset=["ProteinName"]).drop_duplicates("ProteinName")
+    names = pd.Index(main["ProteinName"].astype(object))
+    sequences = main["Sequence"].astype(object).fillna("").to_numpy(dtype=object)
+    groups = {tool: read_peptide_groups(source, names, chunk_rows, memory_mb, spill_dir)
+              for tool, source in tool_sources.items()}
+    return ProteinIndex(names.to_numpy(dtype=object), sequences, groups)
+
+
+def load_index_streaming(main, tools, **kwargs):
+    """Cached :func:`build_index_streaming`.
+
+    As for :func:`proteomics_explore.index.load_index`, ``main`` is a
+    ``(content_hash, source)`` pair and ``tools`` maps each tool name to such a
+    pair, so the caller's hashes are reused instead of hashing the bytes again.
+    """
+    key = ("streaming_index", main[0]) + tuple((tool, h) for tool, (h, _) in tools.items())
+    index = upload_cache().get(key)
+    if index is None:
+        sources = {tool: source for tool, (_, source) in tools.items()}
+        index = upload_cache().put(key, build_index_streaming(main[1], sources, **kwargs))
+    return index
@@ -0,0 +1,109 @@
+"""Reproducible synthetic proteomes and tool peptide tables.
+
+Protein sequences are drawn from background amino-acid frequencies, and each
+tool's peptides are sampled from an in-silico digestion of those sequences
+with a protease rule: fully cleaved peptides, peptides with up to
+``missed_cleavages`` missed sites and, for a ``semi_fraction`` of them,
+peptides trimmed at one terminus (semi-tryptic). The tools sample the same
+digestion independently, so they overlap the way real search engines do.
+Everything is derived from one seed, so the same arguments always give the
+same tables.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+from .classify import DEFAULT_PROTEASE, cleavage_index
+
+AMINO_ACIDS = "ACDEFGHIKLMNPQRSTVWY"
+# Background composition of UniProtKB/Swiss-Prot (%), in the order of AMINO_ACIDS
+FREQUENCIES = np.array([8.25, 1.38, 5.46, 6.72, 3.86, 7.07, 2.27, 5.91, 5.80, 9.66,
+                        2.41, 4.06, 4.74, 3.93, 5.53, 6.65, 5.36, 6.86, 1.10, 2.92])
+
+MIN_PEPTIDE_LENGTH = 6
+MAX_PEPTIDE_LENGTH = 30
+
+
+def random_sequences(lengths, rng):
+    """One random sequence per entry of ``lengths``."""
+    residues = np.frombuffer(AMINO_ACIDS.encode(), dtype=np.uint8)
+    codes = rng.choice(len(AMINO_ACIDS), size=int(np.sum(lengths)), p=FREQUENCIES / FREQUENCIES.sum())
+    text = residues[codes].tobytes().decode()
+    bounds = np.concatenate(([0], np.cumsum(lengths))).tolist()
+    return [text[start:end] for start, end in zip(bounds[:-1], bounds[1:])]
+
+
+def synthetic_proteome(n_proteins, length=400, seed=0):
+    """Main table with ``n_proteins`` proteins whose lengths are uniform around ``length`` (0.5x to 1.5x)."""
+    rng = np.random.default_rng(seed)
+    low = max(length // 2, MIN_PEPTIDE_LENGTH)
+    lengths = rng.integers(low, max(length * 3 // 2, low) + 1, n_proteins)
+    width = len(str(max(n_proteins - 1, 0)))
+    return pd.DataFrame({
+        "ProteinName": [f"SYN{i:0{width}d}" for i in range(n_proteins)],
+        "Sequence": random_sequences(lengths, rng),
+    })
+
+
+def digest(sequence, protease=DEFAULT_PROTEASE, missed_cleavages=1,
+           min_length=MIN_PEPTIDE_LENGTH, max_length=MAX_PEPTIDE_LENGTH):
+    """``(start, end)`` of every in-silico peptide with at most ``missed_cleavages`` missed sites."""
+    sites = np.flatnonzero(cleavage_index(sequence, protease)[:-1]) + 1
+    bounds = [0] + sites.tolist() + [len(sequence)]
+    peptides = []
+    for i, start in enumerate(bounds[:-1]):
+        for end in bounds[i + 1:i + missed_cleavages + 2]:
+            if min_length <= end - start <= max_length:
+                peptides.append((start, end))
+    return peptides
+
+
+def tool_peptides(proteome, column, peptides=20, missed_cleavages=1, semi_fraction=0.1,
+                  protease=DEFAULT_PROTEASE, seed=0):
+    """Tool table with up to ``peptides`` digestion products per protein in ``column``.
+
+    A ``semi_fraction`` of the sampled peptides loses one to several residues
+    at a random terminus, which makes that terminus non-tryptic.
+    """
+    rng = np.random.default_rng(seed)
+    names, sequences = [], []
+    for name, sequence in zip(proteome["ProteinName"], proteome["Sequence"]):
+        candidates = digest(sequence, protease, missed_cleavages)
+        if not candidates:
+            continue
+        for n in rng.choice(len(candidates), size=min(peptides, len(candidates)), replace=False).tolist():
+            start, end = candidates[n]
+            if end - start > MIN_PEPTIDE_LENGTH and rng.random() < semi_fraction:
+                trim = int(rng.integers(1, end - start - MIN_PEPTIDE_LENGTH + 1))
+                start, end = (start + trim, end) if rng.random() < 0.5 else (start, end - trim)
+            names.append(name)
+            sequences.append(sequence[start:end])
+    return pd.DataFrame({"ProteinName": names, column: sequences})
+
+
+def synthetic_dataset(n_proteins, length=400, peptides=20, n_tools=2, missed_cleavages=1, semi_fraction=0.1,
+                      protease=DEFAULT_PROTEASE, seed=0):
+    """``(main table, {tool: tool table})`` with tools named TOOL-A, TOOL-B, ..."""
+    proteome = synthetic_proteome(n_proteins, length, seed)
+    tools = {}
+    for n in range(n_tools):
+        letter = chr(ord("A") + n)
+        tools[f"TOOL-{letter}"] = tool_peptides(proteome, f"Peptides_{letter}", peptides, missed_cleavages,
+                                                semi_fraction, protease, seed=(seed, n + 1))
+    return proteome, tools
+
+
+def write_dataset(directory, n_proteins, **kwargs):
+    """Write ``main.csv`` and ``tool_a.csv``, ``tool_b.csv``, ... to ``directory``; returns ``{table: path}``.
+
+    Keyword arguments are passed to :func:`synthetic_dataset`.
+    """
+    os.makedirs(directory, exist_ok=True)
+    proteome, tools = synthetic_dataset(n_proteins, **kwargs)
+    paths = {"main": os.path.join(directory, "main.csv")}
+    proteome.to_csv(paths["main"], index=False)
+    for tool, df in tools.items():
+        paths[tool] = os.path.join(directory, f"{tool.replace('-', '_').lower()}.csv")
+        df.to_csv(paths[tool], index=False)
+    return paths
@@ -0,0 +1,83 @@
+"""Compiled dataset bundles against the live index they were compiled from."""
+import pandas as pd
+import pytest
+
+from proteomics_explore.analysis import match_peptides
+from proteomics_explore.batch import summarize_proteome
+from proteomics_explore.bundle import StringArray, compile_bundle, open_bundle
+from proteomics_explore.index import ProteinIndex
+from proteomics_explore.overlap import OverlapCounts
+from proteomics_explore.synthetic import synthetic_dataset
+
+
+@pytest.fixture(scope="module")
+def index():
+    main, tools = synthetic_dataset(120, length=200, peptides=15, n_tools=3)
+    return ProteinIndex.build(main, tools)
+
+
+@pytest.fixture(scope="module")
+def bundle(index, tmp_path_factory):
+    return compile_bundle(index, tmp_path_factory.mktemp("bundle"), workers=2, chunk_size=25)
+
+
+def test_string_array_round_trip():
+    strings = ["PEPTIDÉ", "", "ABC", "ÅÄÖ", "XYZ"]
+    array = StringArray(*StringArray.encode(strings))
+    assert len(array) == len(strings)
+    assert list(array) == strings
+    assert list(array[0:5]) == strings
+    assert list(array[1:3]) == strings[1:3]
+    assert list(array[2:2]) == []
+    assert array[-1] == "XYZ"
+
+
+def test_round_trip(index, bundle):
+    assert list(bundle.names) == list(index.names)
+    assert list(bundle.sequences) == list(index.sequences)
+    assert bundle.tools == index.tools
+    for tool in index.tools:
+        for i in range(len(index)):
+            assert list(bundle.groups[tool].get(i)) == list(index.groups[tool].get(i))
+
+
+def test_hits_match_live_matching(index, bundle):
+    for i, name in enumerate(index.names):
+        peptides = {tool: list(groups.get(i)) for tool, groups in index.groups.items()}
+        assert sorted(bundle.hits(name)) == sorted(match_peptides(index.sequences[i], peptides))
+
+
+def test_summary_and_overlap_match_batch(index, bundle):
+    overlap = OverlapCounts(index.tools)
+    live = summarize_proteome(index, workers=1, overlap=overlap)
+    pd.testing.assert_frame_equal(bundle.summary(), live)
+    pd.testing.assert_frame_equal(bundle.overlap(), overlap.frame())
+    assert bundle.summary("lys-c") is None
+    # A bundle is an index, so other protease rules are summarised from it directly
+    pd.testing.assert_frame_equal(summarize_proteome(bundle, workers=1, protease="lys-c"),
+                                  summarize_proteome(index, workers=1, protease="lys-c"))
+
+
+def test_recompile_opens_afresh(index, tmp_path):
+    first = compile_bundle(index, tmp_path, workers=1)
+    assert open_bundle(tmp_path) is first
+    second = compile_bundle(index, tmp_path, workers=1)
+    assert second is not first
+    assert second.dataset_id != first.dataset_id
+
+
+def test_empty_proteome(tmp_path):
+    index = ProteinIndex.build(pd.DataFrame({"ProteinName": [], "Sequence": []}),
+                               {"TOOL-A": pd.DataFrame({"ProteinName": [], "Peptides_A": []})})
+    bundle = compile_bundle(index, tmp_path, workers=1)
+    assert len(bundle) == 0
+    assert bundle.tools == ["TOOL-A"]
+    assert bundle.summary().empty
+    assert bundle.overlap().empty
+
+
+def test_incomplete_bundle_does_not_open(index, tmp_path):
+    compile_bundle(index, tmp_path, workers=1)
+    (tmp_path / "meta.json").unlink()
+    with pytest.raises(FileNotFoundError):
+        open_bundle(tmp_path)
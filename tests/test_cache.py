@@ -0,0 +1,128 @@
+"""Size budgets, expiry and eviction order of the in-process, SQLite and result caches."""
+import threading
+
+import pytest
+
+from proteomics_explore import cache
+from proteomics_explore.cache import LRUCache, ResultCache, SQLiteStore
+
+
+class Clock:
+    """Stands in for the ``time`` module so expiry can be tested without sleeping."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache, "time", clock)
+    return clock
+
+
+def test_lru_evicts_least_recently_used():
+    lru = LRUCache(10, sizeof=len)
+    lru.put("a", "xxxx")
+    lru.put("b", "xxxx")
+    assert lru.get("a") == "xxxx"
+    lru.put("c", "xxxx")
+    assert "b" not in lru and "a" in lru and "c" in lru
+    assert lru.nbytes == 8 and len(lru) == 2
+    # Replacing a key releases its old size
+    lru.put("a", "xx")
+    assert lru.nbytes == 6
+    lru.resize(4)
+    assert list(lru._data) == ["a"] and lru.nbytes == 2
+
+
+def test_lru_does_not_keep_oversize_values():
+    lru = LRUCache(10, sizeof=len)
+    lru.put("a", "xxxx")
+    assert lru.put("b", "x" * 11) == "x" * 11
+    assert "b" not in lru and lru.get("a") == "xxxx" and lru.nbytes == 4
+
+
+def test_lru_ttl(clock):
+    lru = LRUCache(100, sizeof=len, ttl=5)
+    lru.put("a", "x")
+    clock.now += 5
+    assert lru.get("a") == "x"
+    clock.now += 0.5
+    assert "a" not in lru
+    assert lru.get("a", "missing") == "missing"
+    assert lru.nbytes == 0 and len(lru) == 0
+
+
+def test_sizeof_counts_container_items():
+    items = [b"x" * 1000 for _ in range(10)]
+    assert cache.sizeof(items) > 10_000
+    assert cache.sizeof({"key": items}) > cache.sizeof(items)
+
+
+def test_sqlite_evicts_least_recently_accessed(tmp_path, clock):
+    value = b"x" * 100
+    store = SQLiteStore(str(tmp_path / "results.db"), max_bytes=250)
+    store.put("a", value)
+    clock.now += 1
+    store.put("b", value)
+    clock.now += 1
+    assert store.get("a") == value
+    clock.now += 1
+    store.put("c", value)
+    assert store.get("b") is None
+    assert store.get("a") == value and store.get("c") == value
+    # Blobs larger than the whole budget are skipped
+    store.put("d", b"x" * 300)
+    assert store.get("d") is None and store.get("a") == value
+
+
+def test_sqlite_ttl(tmp_path, clock):
+    store = SQLiteStore(str(tmp_path / "results.db"), max_bytes=1000, ttl=10)
+    store.put("a", [1, 2, 3])
+    clock.now += 10
+    assert store.get("a") == [1, 2, 3]
+    # Reading does not extend the lifetime of an entry
+    clock.now += 1
+    assert store.get("a") is None
+
+
+def test_result_cache_computes_once():
+    results = ResultCache(1 << 20)
+    calls = []
+    barrier = threading.Barrier(4)
+
+    def compute():
+        calls.append(1)
+        return {"value": 42}
+
+    def worker():
+        barrier.wait()
+        assert results.get_or_compute(("kind", "hash", "P1"), compute) == {"value": 42}
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    stats = results.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (3, 1, 1)
+    assert stats["bytes"] > 0
+
+
+def test_result_cache_reads_disk_copy(tmp_path):
+    path = str(tmp_path / "results.db")
+    ResultCache(1 << 20, disk_path=path).put(("kind", "hash", "P1"), [1, 2])
+    # A new process starts with an empty memory cache but the same file
+    results = ResultCache(1 << 20, disk_path=path)
+    assert results.get_or_compute(("kind", "hash", "P1"), lambda: pytest.fail("recomputed")) == [1, 2]
+    assert ("kind", "hash", "P1") in results.memory
+    results.clear()
+    assert results.get(("kind", "hash", "P1")) is None
@@ -0,0 +1,105 @@
+"""Protease cleavage rules and best-site semi-tryptic classification against per-residue reference implementations."""
+import random
+
+import numpy as np
+import pytest
+
+from proteomics_explore.classify import (NOT_SEMI_TRYPTIC, PROTEASES, SEMI_TRYPTIC, cleavage_index,
+                                         classify_simplified_semi_tryptic, classify_sites,
+                                         count_simplified_semi_tryptic, get_protease)
+from proteomics_explore.matcher import Hit
+
+
+def naive_sites(sequence, rule):
+    return [residue in rule.cleave_after and (i + 1 == len(sequence) or sequence[i + 1] not in rule.not_before)
+            for i, residue in enumerate(sequence)]
+
+
+def naive_termini(sequence, start, end, rule):
+    sites = naive_sites(sequence, rule)
+    return start > 0 and sites[start - 1], sites[end - 1]
+
+
+def naive_classify(sequence, peptide, rule):
+    # Best number of tryptic termini over every occurrence of the peptide
+    best = -1
+    start = sequence.find(peptide)
+    while start != -1:
+        best = max(best, sum(naive_termini(sequence, start, start + len(peptide), rule)))
+        start = sequence.find(peptide, start + 1)
+    return SEMI_TRYPTIC if best == 1 else NOT_SEMI_TRYPTIC
+
+
+def random_sequence(rng, length=200, alphabet="AKRPEG"):
+    return "".join(rng.choice(alphabet) for _ in range(length))
+
+
+@pytest.mark.parametrize("protease", sorted(PROTEASES))
+@pytest.mark.parametrize("seed", range(10))
+def test_cleavage_index_matches_reference(protease, seed):
+    sequence = random_sequence(random.Random(seed))
+    sites = cleavage_index(sequence, protease)
+    assert sites.tolist() == naive_sites(sequence, PROTEASES[protease])
+    assert not sites.flags.writeable
+
+
+def test_protease_rules():
+    sequence = "AKPARAEGKRP"
+    assert np.flatnonzero(cleavage_index(sequence, "simplified-trypsin")).tolist() == [1, 4, 8, 9]
+    # Trypsin does not cleave before proline
+    assert np.flatnonzero(cleavage_index(sequence, "trypsin")).tolist() == [4, 8]
+    assert np.flatnonzero(cleavage_index(sequence, "lys-c")).tolist() == [1, 8]
+    assert np.flatnonzero(cleavage_index(sequence, "glu-c")).tolist() == [6]
+    # The last residue has no next residue to block it
+    assert cleavage_index("AAK", "trypsin").tolist() == [False, False, True]
+    assert cleavage_index("", "trypsin").tolist() == []
+
+
+def test_unknown_protease():
+    with pytest.raises(ValueError, match="Unknown protease"):
+        get_protease("pepsin")
+    assert get_protease(PROTEASES["lys-c"]) is PROTEASES["lys-c"]
+
+
+def test_best_site_over_all_occurrences():
+    # PEPK first occurs after A (C-terminus only) and then after K (both termini)
+    sequence = "MAPEPKAKPEPK"
+    assert classify_simplified_semi_tryptic(sequence, "PEPK") == NOT_SEMI_TRYPTIC
+    # Under trypsin the second site is blocked by the proline, so the peptide becomes semi-tryptic
+    assert classify_simplified_semi_tryptic(sequence, "PEPK", "trypsin") == SEMI_TRYPTIC
+    # The protein N-terminus is not a tryptic terminus
+    assert classify_simplified_semi_tryptic("MAKAAK", "MAK") == SEMI_TRYPTIC
+    assert classify_simplified_semi_tryptic("MAKAAK", "AAK") == NOT_SEMI_TRYPTIC
+    assert classify_simplified_semi_tryptic("MAKAAK", "WWW") == NOT_SEMI_TRYPTIC
+    assert classify_simplified_semi_tryptic("MAKAAK", "") == NOT_SEMI_TRYPTIC
+
+
+@pytest.mark.parametrize("protease", sorted(PROTEASES))
+@pytest.mark.parametrize("seed", range(10))
+def test_classification_matches_reference(protease, seed):
+    rng = random.Random(seed)
+    sequence = random_sequence(rng)
+    rule = PROTEASES[protease]
+    peptides = []
+    for _ in range(60):
+        size = rng.randint(1, 4)
+        start = rng.randrange(len(sequence) - size)
+        peptides.append(sequence[start:start + size])
+    peptides = list(dict.fromkeys(peptides)) + ["WWW"]
+    hits = []
+    for pep in peptides:
+        start = sequence.find(pep)
+        while start != -1:
+            hits.append(Hit(pep, start, start + len(pep), "TOOL-A"))
+            start = sequence.find(pep, start + 1)
+
+    expected = [naive_classify(sequence, pep, rule) for pep in peptides]
+    assert [classify_simplified_semi_tryptic(sequence, pep, protease) for pep in peptides] == expected
+    assert count_simplified_semi_tryptic(sequence, peptides, hits, "TOOL-A", protease) == expected.count(SEMI_TRYPTIC)
+    assert count_simplified_semi_tryptic(sequence, peptides, hits, "TOOL-B", protease) == 0
+
+    sites = classify_sites(sequence, hits, protease)
+    for row in sites.itertuples():
+        n_tryptic, c_tryptic = naive_termini(sequence, row.start, row.end, rule)
+        assert (row.n_tryptic, row.c_tryptic, row.semi_tryptic) == (n_tryptic, c_tryptic, n_tryptic != c_tryptic)
+    assert list(zip(sites["start"], sites["end"])) == sorted(zip(sites["start"], sites["end"]))
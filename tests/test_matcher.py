@@ -0,0 +1,115 @@
+"""PeptideMatcher against plain ``str.find`` scans and the original per-peptide coverage and classification."""
+import random
+
+import pytest
+
+from proteomics_explore import matcher
+from proteomics_explore.analysis import count_semi_tryptic
+from proteomics_explore.classify import SEMI_TRYPTIC, classify_simplified_semi_tryptic
+from proteomics_explore.coverage import Coverage
+from proteomics_explore.matcher import Hit, PeptideMatcher
+
+
+def find_all(sequence, peptides_by_tool):
+    hits = set()
+    for tool, peptides in peptides_by_tool.items():
+        for pep in set(peptides):
+            start = sequence.find(pep)
+            while start != -1:
+                hits.add(Hit(pep, start, start + len(pep), tool))
+                start = sequence.find(pep, start + 1)
+    return hits
+
+
+def calculate_coverage(seq, peptides):
+    # Coverage as computed by the original app
+    covered_positions = set()
+    for pep in peptides:
+        start_idx = 0
+        while (start_idx := seq.find(pep, start_idx)) != -1:
+            covered_positions.update(range(start_idx, start_idx + len(pep)))
+            start_idx += 1
+    return (len(covered_positions) / len(seq)) * 100 if len(seq) > 0 else 0
+
+
+def random_case(rng, alphabet="ACKR", length=300, n_peptides=80):
+    # A small alphabet gives many overlapping, nested and repeated occurrences
+    sequence = "".join(rng.choice(alphabet) for _ in range(length))
+    peptides_by_tool = {}
+    for tool in ("TOOL-A", "TOOL-B"):
+        peptides = []
+        for _ in range(n_peptides):
+            size = rng.randint(1, 8)
+            if rng.random() < 0.8:
+                start = rng.randrange(length - size)
+                peptides.append(sequence[start:start + size])
+            else:
+                peptides.append("".join(rng.choice(alphabet) for _ in range(size)))
+        peptides_by_tool[tool] = peptides
+    return sequence, peptides_by_tool
+
+
+@pytest.fixture(params=["automaton", "find"])
+def min_patterns(request, monkeypatch):
+    # Exercise the automaton and the str.find fallback on the same cases
+    monkeypatch.setattr(matcher, "AUTOMATON_MIN_PATTERNS", 0 if request.param == "automaton" else 10 ** 9)
+    return request.param
+
+
+def test_builds_automaton_from_threshold():
+    small = PeptideMatcher({"TOOL-A": [f"PEP{i}" for i in range(matcher.AUTOMATON_MIN_PATTERNS - 1)]})
+    large = PeptideMatcher({"TOOL-A": [f"PEP{i}" for i in range(matcher.AUTOMATON_MIN_PATTERNS)]})
+    assert small._delta is None
+    assert large._delta is not None
+
+
+def test_nested_and_overlapping_patterns(min_patterns):
+    # "ABAB" overlaps itself, "BA" and "A" are found through failure links
+    peptides_by_tool = {"TOOL-A": ["ABAB", "BA", "A", "BABA"], "TOOL-B": ["A", "ABABABA"]}
+    sequence = "ABABABAB"
+    hits = PeptideMatcher(peptides_by_tool).find(sequence)
+    assert len(hits) == len(set(hits))
+    assert set(hits) == find_all(sequence, peptides_by_tool)
+
+
+def test_peptide_shared_by_tools_yields_hit_per_tool(min_patterns):
+    hits = PeptideMatcher({"TOOL-A": ["KR", "KR"], "TOOL-B": ["KR"]}).find("AKRAKR")
+    assert sorted(hits) == [Hit("KR", 1, 3, "TOOL-A"), Hit("KR", 1, 3, "TOOL-B"),
+                            Hit("KR", 4, 6, "TOOL-A"), Hit("KR", 4, 6, "TOOL-B")]
+
+
+def test_skips_missing_and_empty_input(min_patterns):
+    assert PeptideMatcher({"TOOL-A": [float("nan"), "", None, "AK"]}).find("AKAK") == [
+        Hit("AK", 0, 2, "TOOL-A"), Hit("AK", 2, 4, "TOOL-A")]
+    assert PeptideMatcher({"TOOL-A": ["AK"]}).find(float("nan")) == []
+    assert PeptideMatcher({"TOOL-A": []}).find("AKAK") == []
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_matches_str_find(min_patterns, seed):
+    sequence, peptides_by_tool = random_case(random.Random(seed))
+    hits = PeptideMatcher(peptides_by_tool).find(sequence)
+    assert len(hits) == len(set(hits))
+    assert set(hits) == find_all(sequence, peptides_by_tool)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_coverage_matches_original(min_patterns, seed):
+    sequence, peptides_by_tool = random_case(random.Random(seed), alphabet="ACDEKRP")
+    coverage = Coverage.from_hits(len(sequence), PeptideMatcher(peptides_by_tool).find(sequence),
+                                  list(peptides_by_tool))
+    for tool, peptides in peptides_by_tool.items():
+        assert coverage.percent(tool) == pytest.approx(calculate_coverage(sequence, peptides))
+    assert coverage.union_percent() == pytest.approx(
+        calculate_coverage(sequence, [pep for peptides in peptides_by_tool.values() for pep in peptides]))
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_semi_tryptic_counts_match_per_peptide_classification(min_patterns, seed):
+    sequence, peptides_by_tool = random_case(random.Random(seed), alphabet="ACDEKRP")
+    peptides_by_tool = {tool: list(dict.fromkeys(peptides)) for tool, peptides in peptides_by_tool.items()}
+    hits = PeptideMatcher(peptides_by_tool).find(sequence)
+    counts = count_semi_tryptic(sequence, peptides_by_tool, hits)
+    for tool, peptides in peptides_by_tool.items():
+        assert counts[tool] == sum(classify_simplified_semi_tryptic(sequence, pep) == SEMI_TRYPTIC
+                                   for pep in peptides)
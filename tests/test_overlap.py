@@ -0,0 +1,80 @@
+"""Packed coverage bits and overlap counts against per-residue sets, beyond the 8 tools of one byte."""
+import random
+from collections import Counter
+
+import numpy as np
+import pytest
+
+from proteomics_explore.coverage import Coverage
+from proteomics_explore.matcher import Hit
+from proteomics_explore.overlap import CoverageBits, OverlapCounts, combination_label
+
+
+def random_coverage(rng, length, n_tools):
+    tools = [f"TOOL-{i}" for i in range(n_tools)]
+    hits = []
+    for tool in tools:
+        for _ in range(rng.randint(0, 15)):
+            start = rng.randrange(length)
+            end = min(length, start + rng.randint(1, 25))
+            hits.append(Hit("", start, end, tool))
+    return Coverage.from_hits(length, hits, tools)
+
+
+def naive_codes(coverage):
+    return [sum(1 << i for i, tool in enumerate(coverage.tools) if coverage.depths[tool][pos] > 0)
+            for pos in range(coverage.length)]
+
+
+@pytest.mark.parametrize("n_tools", [1, 3, 8, 9, 10, 16, 17, 20])
+@pytest.mark.parametrize("seed", range(5))
+def test_membership_matches_reference(n_tools, seed):
+    rng = random.Random(seed)
+    # Lengths that are not a multiple of 8 leave padding bits in the last byte
+    coverage = random_coverage(rng, rng.randint(1, 150), n_tools)
+    bits = CoverageBits.from_coverage(coverage)
+    codes = naive_codes(coverage)
+    assert bits.membership().tolist() == codes
+    assert bits.overlap_counts() == {code: n for code, n in Counter(codes).items() if code}
+
+    for tool in coverage.tools:
+        assert bits.covered(tool).tolist() == coverage.covered(tool).tolist()
+        assert bits.percent(tool) == pytest.approx(coverage.covered(tool).mean() * 100)
+        others = np.zeros(coverage.length, dtype=bool)
+        for other in coverage.tools:
+            if other != tool:
+                others |= coverage.covered(other)
+        unique = coverage.covered(tool) & ~others
+        assert bits.unique_percent(tool) == pytest.approx(unique.mean() * 100)
+        assert np.unpackbits(bits.unique(tool), count=coverage.length).astype(bool).tolist() == unique.tolist()
+    subset = coverage.tools[::2]
+    union = np.any([coverage.covered(tool) for tool in subset], axis=0)
+    intersection = np.all([coverage.covered(tool) for tool in subset], axis=0)
+    assert bits.union_percent(subset) == pytest.approx(union.mean() * 100)
+    assert bits.intersection_percent(subset) == pytest.approx(intersection.mean() * 100)
+    assert np.unpackbits(bits.union(subset), count=coverage.length).astype(bool).tolist() == union.tolist()
+    packed = bits.intersection(subset)
+    assert np.unpackbits(packed, count=coverage.length).astype(bool).tolist() == intersection.tolist()
+
+
+def test_empty_protein():
+    coverage = Coverage(0, {"TOOL-A": np.zeros(0, dtype=np.int32)})
+    bits = CoverageBits.from_coverage(coverage)
+    assert bits.membership().tolist() == []
+    assert bits.overlap_counts() == {}
+    assert bits.percent("TOOL-A") == 0.0 and bits.union_percent() == 0.0
+
+
+def test_overlap_counts_accumulate():
+    tools = [f"TOOL-{i}" for i in range(10)]
+    totals = OverlapCounts(tools)
+    totals.add({1 << 9: 4, 1 | 1 << 9: 2})
+    other = OverlapCounts(tools)
+    other.add({1 << 9: 1})
+    totals.merge(other)
+    frame = totals.frame()
+    assert frame["Tools"].tolist() == ["TOOL-9", "TOOL-0 & TOOL-9"]
+    assert frame["Tool Count"].tolist() == [1, 2]
+    assert frame["Residues"].tolist() == [5, 2]
+    assert frame["Proteins"].tolist() == [2, 1]
+    assert combination_label(tools, 1 << 8 | 1 << 3) == "TOOL-3 & TOOL-8"
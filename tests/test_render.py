@@ -0,0 +1,91 @@
+"""Sequence HTML rendering against a per-residue reference renderer."""
+import html
+import random
+import re
+
+import numpy as np
+import pytest
+
+from proteomics_explore.classify import PROTEASES
+from proteomics_explore.render import CLEAVAGE_FLAG, render_sequence_html, stylesheet, tool_slots
+
+RUN = re.compile(r"<span class=pe(\d+)>([^<]+)</span>|([^<]+)")
+
+
+def naive_render(sequence, depths, rule, start, stop):
+    # One flag per residue, then one span per run of equal flags
+    slots = tool_slots(depths)
+    flags = []
+    for i in range(start, stop):
+        flag = sum(1 << slots[tool] for tool, depth in depths.items() if tool in slots and depth[i] > 0)
+        if rule is not None and sequence[i] in rule.cleave_after and (
+                i + 1 == len(sequence) or sequence[i + 1] not in rule.not_before):
+            flag |= CLEAVAGE_FLAG
+        flags.append(flag)
+    parts = []
+    i = 0
+    while i < len(flags):
+        j = i
+        while j < len(flags) and flags[j] == flags[i]:
+            j += 1
+        text = html.escape(sequence[start + i:start + j])
+        parts.append(f"<span class=pe{flags[i]}>{text}</span>" if flags[i] else text)
+        i = j
+    return "".join(parts)
+
+
+def random_depths(rng, length, tools):
+    depths = {}
+    for tool in tools:
+        depth = np.zeros(length, dtype=np.int32)
+        for _ in range(rng.randint(0, 12)):
+            start = rng.randrange(length)
+            depth[start:start + rng.randint(1, 20)] += 1
+        depths[tool] = depth
+    return depths
+
+
+@pytest.mark.parametrize("protease", [None] + sorted(PROTEASES))
+@pytest.mark.parametrize("seed", range(10))
+def test_matches_reference(protease, seed):
+    rng = random.Random(seed)
+    sequence = "".join(rng.choice("AKRPE") for _ in range(150))
+    depths = random_depths(rng, len(sequence), [f"TOOL-{i}" for i in range(rng.randint(1, 8))])
+    start = rng.randrange(len(sequence))
+    stop = rng.randint(start, len(sequence) + 10)
+    rule = PROTEASES[protease] if protease else None
+
+    full = render_sequence_html(sequence, depths, protease)
+    assert full == naive_render(sequence, depths, rule, 0, len(sequence))
+    window = render_sequence_html(sequence, depths, protease, start, stop)
+    assert window == naive_render(sequence, depths, rule, start, min(stop, len(sequence)))
+
+    # The runs spell out the window of the sequence, and adjacent runs never share a flag
+    runs = [(int(flag or 0), span or text) for flag, span, text in RUN.findall(window)]
+    assert "".join(text for _, text in runs) == sequence[start:stop]
+    assert all(a != b for (a, _), (b, _) in zip(runs, runs[1:]))
+    assert all(f".pe{flag}{{" in stylesheet(len(depths)) for flag, _ in runs if flag)
+
+
+def test_runs_are_coalesced():
+    sequence = "AAAAKAAAA"
+    depths = {"TOOL-A": np.array([0, 1, 1, 2, 2, 1, 0, 0, 0], dtype=np.int32)}
+    assert render_sequence_html(sequence, depths, None) == "A<span class=pe1>AAAKA</span>AAA"
+    assert render_sequence_html(sequence, depths) == (
+        "A<span class=pe1>AAA</span><span class=pe65>K</span><span class=pe1>A</span>AAA")
+    assert render_sequence_html(sequence, depths, None, 2, 4) == "<span class=pe1>AA</span>"
+
+
+def test_escapes_sequence_text():
+    sequence = "A<B>&K\"C"
+    depths = {"TOOL-A": np.array([0, 1, 1, 1, 0, 0, 0, 0], dtype=np.int32)}
+    out = render_sequence_html(sequence, depths)
+    assert out == "A<span class=pe1>&lt;B&gt;</span>&amp;<span class=pe64>K</span>&quot;C"
+    assert html.unescape(re.sub(r"<[^>]*>", "", out)) == sequence
+
+
+def test_empty_window():
+    depths = {"TOOL-A": np.ones(5, dtype=np.int32)}
+    assert render_sequence_html("AAKAA", depths, start=3, stop=3) == ""
+    assert render_sequence_html("AAKAA", depths, start=7) == ""
+    assert render_sequence_html("", {"TOOL-A": np.zeros(0, dtype=np.int32)}) == ""
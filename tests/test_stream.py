@@ -0,0 +1,51 @@
+"""Chunked peptide ingestion with spill-to-disk partitions against the in-memory index."""
+import pandas as pd
+import pytest
+
+from proteomics_explore.index import PeptideGroups, ProteinIndex
+from proteomics_explore.stream import SpilledPeptideGroups, build_index_streaming
+from proteomics_explore.synthetic import write_dataset
+
+
+@pytest.fixture(scope="module")
+def dataset(tmp_path_factory):
+    return write_dataset(tmp_path_factory.mktemp("synthetic"), 150, length=200, peptides=15, n_tools=2)
+
+
+def assert_same_groups(index, expected):
+    assert list(index.names) == list(expected.names)
+    assert list(index.sequences) == list(expected.sequences)
+    for tool in expected.tools:
+        assert list(index.groups[tool].counts()) == list(expected.groups[tool].counts())
+        for i in range(len(expected)):
+            assert list(index.groups[tool].get(i)) == list(expected.groups[tool].get(i))
+
+
+def in_memory_index(paths):
+    return ProteinIndex.build(pd.read_csv(paths["main"]),
+                              {tool: pd.read_csv(path) for tool, path in paths.items() if tool != "main"})
+
+
+def test_in_memory_streaming(dataset):
+    index = build_index_streaming(dataset["main"], {tool: path for tool, path in dataset.items() if tool != "main"},
+                                  chunk_rows=97)
+    assert all(isinstance(groups, PeptideGroups) for groups in index.groups.values())
+    assert_same_groups(index, in_memory_index(dataset))
+
+
+def test_spilled_partitions(dataset, tmp_path):
+    # A zero buffer spills every chunk, so each partition file is appended to many times
+    index = build_index_streaming(dataset["main"], {tool: path for tool, path in dataset.items() if tool != "main"},
+                                  chunk_rows=97, memory_mb=0, spill_dir=tmp_path)
+    assert all(isinstance(groups, SpilledPeptideGroups) for groups in index.groups.values())
+    assert_same_groups(index, in_memory_index(dataset))
+
+
+def test_spilled_duplicates_across_chunks(tmp_path):
+    main = tmp_path / "main.csv"
+    main.write_text("ProteinName,Sequence\nP1,AKAK\nP2,CRCR\nP3,DKDK\n")
+    tool = tmp_path / "tool.csv"
+    tool.write_text("ProteinName,Peptides_A\nP1,AK\nP3,DK\nP1,AK\nP9,XX\nP1,KA\nP3,DK\n")
+    index = build_index_streaming(main, {"TOOL-A": tool}, chunk_rows=2, memory_mb=0, spill_dir=tmp_path)
+    groups = index.groups["TOOL-A"]
+    assert [list(groups.get(i)) for i in range(3)] == [["AK", "KA"], [], ["DK"]]